@@ -0,0 +1,207 @@
+"""
+X32 Simple Controller - Last- und Latenztest ohne Mischpult
+Autor: Christopher Gertig
+
+Startet einen simulierten X32 (x32_simulator.py) und main.app als eigenen Prozess,
+verbindet N WebSocket-Clients und misst die Zeit von der Faderbewegung am
+(simulierten) X32 bis zum Eintreffen im Client.
+
+Start: python benchmark.py [--clients 20] [--duration 10] [--fader-rate 50] [--meter-rate 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import websockets
+
+from config import CHANNEL_MAPPING
+from routing import channel_path
+from x32_simulator import start_simulator
+
+# main.app wird in einem eigenen Prozess gestartet, damit dessen CPU-Zeit messbar ist
+SERVER_CODE = """
+import config
+config.X32_IP = "127.0.0.1"
+config.X32_PORT = {x32_port}
+config.LOCAL_PORT = {local_port}
+import main, uvicorn
+uvicorn.run(main.app, host="127.0.0.1", port={http_port}, log_level="critical")
+"""
+
+
+def free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_cpu(pid):
+    """CPU seconds used so far by a process (Linux), None if unavailable"""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            fields = stat.read().rpartition(")")[2].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# Ein simuliertes Tablet: zählt Frames und misst die Latenz jeder Fader-Nachricht
+class BenchmarkClient:
+    def __init__(self, sent_times):
+        self.sent_times = sent_times
+        self.frames = 0
+        self.bytes = 0
+        self.latencies = []
+        self.seen = set()
+        self.faders = {}
+
+    async def run(self, url, binary_meters, stop):
+        async with websockets.connect(url, max_size=None) as ws:
+            if binary_meters:
+                await ws.send(json.dumps({"type": "meter_format", "format": "binary"}))
+            while not stop.is_set():
+                try:
+                    frame = await asyncio.wait_for(ws.recv(), timeout=0.2)
+                except asyncio.TimeoutError:
+                    continue
+                received = time.perf_counter()
+                self.frames += 1
+                self.bytes += len(frame)
+                if isinstance(frame, str):
+                    self._handle(json.loads(frame), received)
+
+    def _handle(self, data, received):
+        if data["type"] == "batch":
+            for message in data["messages"]:
+                self._handle(message, received)
+        elif data["type"] == "snapshot":
+            self.faders.update(data["faders"])
+        elif data["type"] == "fader":
+            key = (data["channel"], data["value"])
+            self.faders[data["channel"]] = data["value"]
+            sent = self.sent_times.get(key)
+            if sent is not None and key not in self.seen:
+                self.seen.add(key)
+                self.latencies.append((received - sent) * 1000.0)
+
+
+async def wait_for_server(port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def run_benchmark(args):
+    x32_port = free_port(socket.SOCK_DGRAM)
+    http_port = free_port()
+    local_port = free_port(socket.SOCK_DGRAM)
+
+    # Simulierter X32 im Benchmark-Prozess: Sendezeitpunkte und Empfang nutzen dieselbe Uhr
+    channel_names = {channel_path(num, "fader"): name for name, num in CHANNEL_MAPPING.items()}
+    sent_times = {}
+    transport, simulator = await start_simulator(
+        "127.0.0.1", x32_port, meter_rate=args.meter_rate,
+        fader_channels=list(CHANNEL_MAPPING.values())
+    )
+    simulator.on_fader_sent = lambda path, value, at: sent_times.__setitem__((channel_names[path], value), at)
+
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER_CODE.format(x32_port=x32_port, local_port=local_port, http_port=http_port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    try:
+        await wait_for_server(http_port)
+
+        stop = asyncio.Event()
+        clients = [BenchmarkClient(sent_times) for _ in range(args.clients)]
+        url = f"ws://127.0.0.1:{http_port}/ws"
+        tasks = [asyncio.create_task(client.run(url, args.binary_meters, stop)) for client in clients]
+        await asyncio.sleep(1.0)
+
+        # Last erzeugen: Faderbewegungen am simulierten X32
+        cpu_before = process_cpu(server.pid)
+        started = time.perf_counter()
+        moves = 0
+        interval = 1.0 / args.fader_rate
+        while time.perf_counter() - started < args.duration:
+            simulator.move_fader(CHANNEL_MAPPING[list(CHANNEL_MAPPING)[moves % len(CHANNEL_MAPPING)]],
+                                 (moves % 1000) / 1000.0)
+            moves += 1
+            await asyncio.sleep(interval)
+        elapsed = time.perf_counter() - started
+        cpu_after = process_cpu(server.pid)
+
+        # Nachlaufzeit, damit die letzten Updates ankommen
+        await asyncio.sleep(0.5)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+        transport.close()
+
+    if cpu_before is not None and cpu_after is not None:
+        server_cpu = cpu_after - cpu_before
+    else:
+        # Ohne /proc: gesamte CPU-Zeit des Serverprozesses inklusive Start
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        server_cpu = usage.ru_utime + usage.ru_stime
+    final_values = {channel_names[path]: simulator.params[path] for path in channel_names}
+    return clients, moves, elapsed, server_cpu, final_values
+
+
+def report(clients, moves, elapsed, server_cpu, final_values):
+    latencies = [latency for client in clients for latency in client.latencies]
+    frames = sum(client.frames for client in clients)
+    received = sum(len(client.seen) for client in clients)
+    stale = sum(1 for client in clients for name, value in final_values.items()
+                if client.faders.get(name) != value)
+    count = len(clients)
+
+    print(f"Clients:                 {count}")
+    print(f"Faderbewegungen am X32:  {moves} in {elapsed:.1f} s")
+    print(f"Latenz X32 -> Browser:   p50 {percentile(latencies, 50):.2f} ms, "
+          f"p95 {percentile(latencies, 95):.2f} ms, p99 {percentile(latencies, 99):.2f} ms, "
+          f"max {max(latencies, default=float('nan')):.2f} ms")
+    print(f"Frames pro Client:       {frames / count / elapsed:.1f} /s "
+          f"({sum(c.bytes for c in clients) / count / elapsed / 1024:.1f} KiB/s)")
+    print(f"Server-CPU pro Client:   {server_cpu / elapsed / count * 100:.2f} %")
+    print(f"Zusammengefasste Updates:{moves * count - received:>6} "
+          f"(von {moves * count}, durch neuere Werte ersetzt oder verworfen)")
+    print(f"Veraltete Endwerte:      {stale} (Kanal zeigt am Ende nicht den Wert des X32)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Last- und Latenztest für den X32 Simple Controller")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="Messdauer in Sekunden")
+    parser.add_argument("--fader-rate", type=float, default=50.0, help="Faderbewegungen pro Sekunde")
+    parser.add_argument("--meter-rate", type=float, default=20.0, help="Meter-Frames pro Sekunde")
+    parser.add_argument("--binary-meters", action="store_true", help="Clients fordern binäre Meter an")
+    report(*asyncio.run(run_benchmark(parser.parse_args())))
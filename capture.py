@@ -0,0 +1,99 @@
+"""
+X32 Simple Controller - Mitschnitt des OSC-Verkehrs in eine binäre Logdatei
+Autor: Christopher Gertig
+
+Jedes Paket vom und zum X32 wird als Datensatz angehängt:
+    uint64 monotonic_ns, uint8 Richtung, uint32 Länge (little-endian), Paketdaten
+Jeder Start beginnt mit einem Sitzungs-Datensatz (Richtung 2, Daten: float64 time.time()),
+die Zeitstempel sind nur innerhalb einer Sitzung vergleichbar. Abspielen: replay.py
+"""
+
+import logging
+import queue
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct("<QBI")
+CAPTURE_IN = 0       # vom X32 empfangen
+CAPTURE_OUT = 1      # an das X32 gesendet
+CAPTURE_SESSION = 2  # Beginn einer Sitzung
+SESSION_PAYLOAD = struct.Struct("<d")
+
+# Ab dieser Puffergröße (Bytes) geht der Puffer sofort an den Schreib-Thread
+CAPTURE_CHUNK = 256 * 1024
+
+
+def read_records(buffer):
+    """Iterate (monotonic_ns, direction, payload memoryview) over a log in memory or an mmap"""
+    view = memoryview(buffer)
+    offset = 0
+    end = len(view)
+    while offset + RECORD_HEADER.size <= end:
+        timestamp, direction, length = RECORD_HEADER.unpack_from(view, offset)
+        offset += RECORD_HEADER.size
+        if offset + length > end:
+            break  # unvollständiger letzter Datensatz (z.B. Absturz beim Schreiben)
+        yield timestamp, direction, view[offset:offset + length]
+        offset += length
+
+
+# Gepufferter Mitschnitt: record() hängt nur an einen Puffer an,
+# geschrieben wird in einem eigenen Thread
+class CaptureLog:
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._buffer = bytearray()
+        self._chunks = queue.SimpleQueue()
+        self._thread = None
+
+    def start(self):
+        """Open the log for appending and start a new session"""
+        self._thread = threading.Thread(target=self._writer, name="osc-capture", daemon=True)
+        self._thread.start()
+        self._append(CAPTURE_SESSION, SESSION_PAYLOAD.pack(time.time()))
+        logger.info(f"Capturing OSC traffic to {self.path}")
+
+    def record(self, direction, data):
+        """Append one packet (called on the event loop for every packet)"""
+        self._append(direction, data)
+        if len(self._buffer) >= CAPTURE_CHUNK:
+            self.flush()
+
+    def _append(self, direction, data):
+        self._buffer += RECORD_HEADER.pack(time.monotonic_ns(), direction, len(data))
+        self._buffer += data
+        self.records += 1
+
+    def flush(self):
+        """Hand everything buffered to the writer thread"""
+        if self._buffer:
+            self._chunks.put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def close(self):
+        """Write what is left and stop the writer thread"""
+        if self._thread is None:
+            return
+        self.flush()
+        self._chunks.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _writer(self):
+        try:
+            with open(self.path, "ab") as f:
+                while True:
+                    chunk = self._chunks.get()
+                    if chunk is None:
+                        return
+                    f.write(chunk)
+                    f.flush()
+        except OSError as e:
+            logger.error(f"OSC capture stopped, cannot write {self.path}: {e}")
+            # Weitere Puffer verwerfen, damit sie sich nicht im Speicher sammeln
+            while self._chunks.get() is not None:
+                pass
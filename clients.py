@@ -0,0 +1,164 @@
+"""
+X32 Simple Controller - WebSocket-Clients mit eigenem Sendepuffer
+Autor: Christopher Gertig
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+import metrics
+from config import CLIENT_QUEUE_SIZE, CLIENT_OVERFLOW_POLICY, CLIENT_LAG_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("latest", "drop_oldest")
+
+
+# Ein verbundener WebSocket-Client mit begrenztem Puffer und eigenem Sende-Task
+class ClientConnection:
+    def __init__(self, websocket, max_queue=CLIENT_QUEUE_SIZE,
+                 overflow_policy=CLIENT_OVERFLOW_POLICY, lag_timeout=CLIENT_LAG_TIMEOUT, measure=True):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.websocket = websocket
+        self.closed = False
+        self.dropped = 0
+        self.binary_meters = False  # Meter-Daten als binäre Frames statt JSON
+        self.wants_meters = True    # Client zeigt gerade Meter an
+        self.wants_console = True   # Client braucht den laufend abgefragten Pultzustand
+        self.topics = None          # Themen-Abo (topics.TopicFilter), None = alle Updates
+        self._max_queue = max_queue
+        self._coalesce = overflow_policy == "latest"
+        self._lag_timeout = lag_timeout
+        self._measure = measure  # Sendeverzögerung und Latenz für metrics erfassen
+        # Einträge: (key, message, origin, enqueued); message None = Wert liegt in _pending
+        # origin/enqueued sind Zeitstempel für metrics (None, solange nicht gemessen wird)
+        self._queue = deque()
+        self._pending = {}     # key -> neueste Nachricht (nur bei "latest")
+        self._wakeup = asyncio.Event()
+        self._lagging_since = None
+        self._task = None
+
+    def start(self):
+        """Start the writer task for this client"""
+        self._task = asyncio.create_task(self._writer())
+
+    def send(self, message, key=None, origin=None):
+        """Queue a message without waiting; returns False if the client is gone
+        origin: perf_counter() time the underlying X32 data arrived (for metrics)
+        """
+        if self.closed:
+            return False
+
+        # Neuester Wert ersetzt einen noch nicht gesendeten Wert desselben Kanals
+        if self._coalesce and key is not None and key in self._pending:
+            self._pending[key] = message
+            return True
+
+        enqueued = None
+        if metrics.enabled and self._measure:
+            enqueued = time.perf_counter()
+            origin = origin or enqueued
+        if self._coalesce and key is not None:
+            entry = (key, None, origin, enqueued)
+        else:
+            entry = (key, message, origin, enqueued)
+
+        if len(self._queue) >= self._max_queue:
+            now = time.monotonic()
+            if self._lagging_since is None:
+                self._lagging_since = now
+            elif now - self._lagging_since > self._lag_timeout:
+                logger.warning("Disconnecting lagging client (%d updates dropped)", self.dropped)
+                metrics.client_disconnects.inc()
+                self._disconnect()
+                return False
+            if not self._drop_one():
+                if key is not None:
+                    # Nur Zustand im Puffer: stattdessen die neue Meter-Nachricht verwerfen
+                    self._count_drop()
+                    return True
+                # Zustands-Frames gehen nie verloren, der Puffer wächst bis zum Lag-Timeout
+
+        if entry[1] is None:
+            self._pending[key] = message
+        self._queue.append(entry)
+        self._wakeup.set()
+        return True
+
+    def _drop_one(self):
+        """Drop one queued entry; False if nothing may be dropped"""
+        # Bei beiden Verfahren nur die älteste Meter-Nachricht (mit Schlüssel) verwerfen,
+        # Zustands-Frames ohne Schlüssel nie
+        victim = next((i for i, entry in enumerate(self._queue) if entry[0] is not None), None)
+        if victim is None:
+            return False
+        self._count_drop()
+        key, message, _, _ = self._queue[victim]
+        del self._queue[victim]
+        if message is None:
+            del self._pending[key]
+        return True
+
+    def _count_drop(self):
+        self.dropped += 1
+        metrics.client_dropped.inc()
+
+    def _pop(self):
+        key, message, origin, enqueued = self._queue.popleft()
+        if message is None:
+            message = self._pending.pop(key)
+        return message, origin, enqueued
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    async def _writer(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self._queue:
+                    message, origin, enqueued = self._pop()
+                    if isinstance(message, bytes):
+                        await self.websocket.send_bytes(message)
+                    else:
+                        await self.websocket.send_text(message)
+                    if enqueued is not None:
+                        now = time.perf_counter()
+                        metrics.client_send_lag.observe(now - enqueued)
+                        metrics.update_latency.observe(now - origin)
+                self._lagging_since = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to client: {e}")
+            self.closed = True
+
+    def _disconnect(self):
+        self.closed = True
+        self._queue.clear()
+        self._pending.clear()
+        if self._task:
+            self._task.cancel()
+        # 1013 = "Try Again Later"; der Browser verbindet sich automatisch neu
+        asyncio.create_task(self._close_socket(1013))
+
+    async def _close_socket(self, code):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def close(self):
+        """Stop the writer task; the socket itself is owned by the endpoint"""
+        self.closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
@@ -0,0 +1,133 @@
+"""
+X32 Simple Controller - Prüfung der Befehle von WebSocket-Clients
+Autor: Christopher Gertig
+
+Ein Frame enthält einen einzelnen Befehl oder mehrere als Batch (wie die Updates vom Server):
+    {"type": "fader", "channel": "HDMI", "value": 0.5}
+    {"type": "batch", "messages": [{"type": "fader", ...}, {"type": "mute", ...}]}
+Erlaubte Kanäle und Wertebereiche werden beim Start aus COMMAND_PATHS vorberechnet.
+Ungültige Befehle werden nicht ausgeführt und bekommen eine Fehlerantwort, die
+Verbindung bleibt bestehen:
+    {"type": "error", "code": "unknown_channel", "message": "...", "index": 1, "id": ...}
+"index" ist die Position im Batch, "id" wird unverändert zurückgegeben, falls gesetzt.
+"""
+
+from config import FADE_MAX_DURATION
+from fades import FADE_CURVES
+
+COMMAND_TYPES = ("fader", "mute", "recall_preset", "fade")
+
+
+class CommandError(ValueError):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def command_error(code, message, command=None):
+    """Error reply for a client; index and id are taken over from the command"""
+    error = {"type": "error", "code": code, "message": message}
+    if isinstance(command, dict):
+        for key in ("index", "id"):
+            if key in command:
+                error[key] = command[key]
+    return error
+
+
+def _number(message, key, low, high):
+    value = message.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise CommandError("invalid_value", f"{key} must be a number")
+    if not low <= value <= high:  # NaN fällt hier ebenfalls heraus
+        raise CommandError("out_of_range", f"{key} must be between {low} and {high}")
+    return float(value)
+
+
+# Vorberechnete Kanaltabellen pro Befehlstyp; validate() erzeugt normalisierte Befehle
+# {"type", "path", ...}, die sich als JSON an den Ingest-Prozess weitergeben lassen
+class CommandSchema:
+    def __init__(self, command_paths, batch_limit):
+        self.batch_limit = batch_limit
+        self._paths = {}
+        for (kind, channel), path in command_paths.items():
+            self._paths.setdefault(kind, {})[channel] = path
+        self._validators = {"fader": self._fader, "mute": self._mute,
+                            "fade": self._fade, "recall_preset": self._recall_preset}
+
+    def parse(self, frame):
+        """Validate a decoded frame; returns (commands, error replies)"""
+        if isinstance(frame, dict) and frame.get("type") == "batch":
+            messages = frame.get("messages")
+            if not isinstance(messages, list):
+                return [], [command_error("invalid_batch", "messages must be a list", frame)]
+            if len(messages) > self.batch_limit:
+                return [], [command_error("batch_too_large",
+                                          f"At most {self.batch_limit} commands per batch", frame)]
+            indexed = True
+        else:
+            messages = [frame]
+            indexed = False
+
+        commands, errors = [], []
+        for index, message in enumerate(messages):
+            try:
+                command = self.validate(message)
+            except CommandError as e:
+                if isinstance(message, dict):
+                    message = dict(message, index=index) if indexed else message
+                else:
+                    message = {"index": index} if indexed else None
+                errors.append(command_error(e.code, str(e), message))
+                continue
+            if indexed:
+                command["index"] = index
+            commands.append(command)
+        return commands, errors
+
+    def validate(self, message):
+        """Normalized copy of one command; CommandError if it is not allowed"""
+        if not isinstance(message, dict):
+            raise CommandError("invalid_command", "Command must be an object")
+        validator = self._validators.get(message.get("type"))
+        if validator is None:
+            raise CommandError("unknown_type", f"Unknown command type: {message.get('type')}")
+        command = validator(message)
+        if "id" in message:
+            command["id"] = message["id"]
+        return command
+
+    def _channel(self, kind, message):
+        channel = message.get("channel")
+        path = self._paths.get(kind, {}).get(channel) if isinstance(channel, str) else None
+        if path is None:
+            raise CommandError("unknown_channel", f"Unknown channel: {channel}")
+        return channel, path
+
+    def _fader(self, message):
+        channel, path = self._channel("fader", message)
+        return {"type": "fader", "channel": channel, "path": path,
+                "value": _number(message, "value", 0.0, 1.0)}
+
+    def _mute(self, message):
+        channel, path = self._channel("mute", message)
+        value = message.get("value")
+        if not isinstance(value, (bool, int, float)) or value not in (0, 1):
+            raise CommandError("invalid_value", "value must be 0, 1, true or false")
+        return {"type": "mute", "channel": channel, "path": path, "value": 1 if value else 0}
+
+    def _fade(self, message):
+        channel, path = self._channel("fader", message)
+        curve = message.get("curve", "linear")
+        if not isinstance(curve, str) or curve not in FADE_CURVES:
+            raise CommandError("invalid_value", f"Unknown curve: {curve} (available: {', '.join(FADE_CURVES)})")
+        return {"type": "fade", "channel": channel, "path": path,
+                "value": _number(message, "value", 0.0, 1.0),
+                "duration": _number(message, "duration", 0.0, FADE_MAX_DURATION),
+                "curve": curve}
+
+    def _recall_preset(self, message):
+        # Ob es das Preset gibt, zeigt sich erst beim Ausführen (Presets liegen im Ingest-Prozess)
+        name = message.get("name")
+        if not isinstance(name, str) or not name:
+            raise CommandError("invalid_value", "name must be a preset name")
+        return {"type": "recall_preset", "name": name}
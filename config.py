@@ -4,6 +4,8 @@ Autor: Christopher Gertig
 Erstellt: Dezember 2024
 """
 
+import os
+
 # Netzwerkkonfiguration für den X32 Digitalmixer
 X32_IP = "192.168.217.20"  # IP-Adresse des X32 Mixers im Netzwerk
 X32_PORT = 10023  # Standard OSC-Port für die X32-Kommunikation
@@ -19,3 +21,92 @@ CHANNEL_MAPPING = {
     "HDMI": 11,        # HDMI-Audioeingang
     "Regie": 13        # Regiekanal für Kommunikation
 }
+
+# WebSocket-Clients: Größe des Sendepuffers pro Client
+CLIENT_QUEUE_SIZE = 64
+# Verhalten bei vollem Puffer:
+#   "latest"      - Meter pro Bank nur mit dem neuesten Wert puffern und bei vollem Puffer zuerst
+#                   verwerfen; Zustands-Updates (Fader, Mutes, Namen) gehen nie verloren
+#   "drop_oldest" - älteste Meter-Nachricht verwerfen, ohne Meter zu ersetzen; Zustands-Updates
+#                   gehen ebenfalls nie verloren (ein dauerhaft überlasteter Client wird getrennt)
+CLIENT_OVERFLOW_POLICY = "latest"
+# Clients, die länger als diese Zeit (Sekunden) überlastet sind, werden getrennt
+CLIENT_LAG_TIMEOUT = 5.0
+# Höchstzahl an Befehlen in einem Batch-Frame eines Clients (siehe commands.py)
+COMMAND_BATCH_LIMIT = 256
+
+# Maximale Rate (Hz), mit der gesammelte Updates an die Clients gesendet werden
+BROADCAST_RATE = 30
+
+# Meter-Bänke, die regelmäßig vom X32 abgefragt werden (siehe meters.py)
+METER_BANKS = ["/meters/2"]
+
+# Verbindungsaufbau zum X32 (läuft im Hintergrund, der Webserver startet sofort)
+X32_CONNECT_TIMEOUT = 2.0        # Wartezeit auf die Antwort auf /xinfo je Versuch
+X32_RECONNECT_DELAY = 1.0        # erste Pause nach einem fehlgeschlagenen Versuch, danach verdoppelt
+X32_RECONNECT_MAX_DELAY = 10.0   # längste Pause zwischen zwei Versuchen
+X32_CONNECTION_TIMEOUT = 20.0    # so lange ohne Daten vom X32 gilt die Verbindung als getrennt
+
+# Automatisches Ducking: senkt den Ziel-Fader um reduction dB ab, solange einer der
+# Auslöser-Kanäle über threshold (dB) liegt; attack, hold und release in Sekunden.
+# Die Pegel kommen aus DUCKING_METER_BANK (Eingänge 1-32), die dafür zusätzlich abgefragt wird.
+DUCKING_RULES = [
+    # {"target": "HDMI", "triggers": ["Headset 1", "Headset 2", "Hand 1", "Hand 2"],
+    #  "threshold": -40.0, "reduction": 15.0, "attack": 0.05, "hold": 1.0, "release": 1.5},
+]
+DUCKING_METER_BANK = "/meters/0"
+
+# Meter-Verlauf: so viele Sekunden werden pro Meter-Bank im Speicher gehalten (0 = aus, z.B. 600).
+# Solange der Verlauf aktiv ist, werden Meter auch ohne zuschauende Clients dauerhaft vom X32
+# abgefragt (ca. 20 Pakete pro Sekunde), daher standardmäßig aus.
+METER_HISTORY_SECONDS = 0
+METER_HISTORY_RATE = 20     # erwartete Meter-Frames pro Sekunde (X32: alle 50 ms); bestimmt die Puffergröße
+METER_PEAK_HOLD = 2.0       # Haltezeit der Spitzenanzeige in Sekunden
+METER_CLIP_DB = 0.0         # ab diesem Pegel zählt ein Frame als Übersteuerung
+
+# Maximale Senderate (Pakete pro Sekunde) für Änderungen an das X32
+X32_SEND_RATE = 50
+# Zeitfenster (Sekunden), in dem Echos eigener Änderungen vom X32 ignoriert werden
+X32_ECHO_WINDOW = 0.5
+
+# Periodischer X32-Verkehr (der X32 beendet /xremote, Abos und Meter nach 10 Sekunden)
+X32_KEEPALIVE_INTERVAL = 9.0      # /xremote
+SUBSCRIPTION_RENEW_INTERVAL = 9.0  # /renew für /formatsubscribe-Abos, nur solange ein Client verbunden ist
+METER_RENEW_INTERVAL = 9.0         # /meters, nur solange ein Client Meter anzeigt
+
+# Spiegel des gesamten Mischpults: Abfrageintervall der /formatsubscribe-Abos in 50-ms-Schritten
+CONSOLE_SUBSCRIPTION_FACTOR = 4
+# Erstes Einlesen nach dem Verbinden: Abfragen pro OSC-Bundle und Abstand der Bundles (Sekunden)
+X32_READ_BATCH = 32
+X32_READ_INTERVAL = 0.02
+
+# Anzahl der HTTP/WebSocket-Prozesse. Bei mehr als 1 besitzt ein eigener Ingest-Prozess
+# (ingest.py) die Verbindung zum X32 und verteilt Updates über eine lokale TCP-Verbindung.
+WORKERS = 1
+INGEST_HOST = "127.0.0.1"
+INGEST_PORT = 64432
+# Sendepuffer des Ingest-Prozesses je Worker (größer als bei Clients, da ein Worker viele Clients bedient)
+WORKER_QUEUE_SIZE = 1024
+
+# Mitschnitt des gesamten OSC-Verkehrs zur Fehlersuche (abspielen mit replay.py); None = aus
+CAPTURE_FILE = None  # z.B. "x32-capture.bin"
+CAPTURE_FLUSH_INTERVAL = 0.5  # Sekunden zwischen Schreibvorgängen
+
+# Log-Level (z.B. "DEBUG", "INFO", "CRITICAL"); Debug-Ausgaben kosten nur Zeit, wenn aktiviert
+LOG_LEVEL = "CRITICAL"
+
+# Datei, in der die Presets (Faderstände und Mutes) gespeichert werden
+PRESETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "presets.json")
+
+# Fades: Abstand der Zwischenwerte (Sekunden) und längste erlaubte Fade-Dauer
+FADE_TICK = 0.02
+FADE_MAX_DURATION = 600
+
+# Audio-Cues: alle Dateien in diesem Ordner werden beim Start geladen (Name = Dateiname ohne Endung)
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio")
+# SDL-Audiotreiber, z.B. "dummy" für Tests ohne Soundkarte; None = Standardtreiber
+AUDIO_DRIVER = None
+# Audiopuffer in Samples; bestimmt die Verzögerung vom Auslösen bis zum Ton (512 ≈ 12 ms)
+AUDIO_BUFFER = 512
+# Standardverhalten, wenn ein Cue ausgelöst wird, während ein anderer läuft (siehe cues.py)
+CUE_POLICY = "stop"
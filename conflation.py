@@ -0,0 +1,64 @@
+"""
+X32 Simple Controller - Zusammenfassen von Updates vor dem Broadcast
+Autor: Christopher Gertig
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+import metrics
+
+from config import BROADCAST_RATE
+
+logger = logging.getLogger(__name__)
+
+
+def encode_updates(messages):
+    """One frame for several updates; a single update keeps its own format"""
+    if len(messages) == 1:
+        return json.dumps(messages[0])
+    return json.dumps({"type": "batch", "messages": messages})
+
+
+# Sammelt Updates pro (Typ, Kanal) und gibt pro Takt nur den neuesten Wert weiter;
+# flush(messages, origin) verteilt sie an die Clients
+class UpdateConflator:
+    def __init__(self, flush, rate=BROADCAST_RATE):
+        self._flush = flush
+        self._interval = 1.0 / rate
+        self._pending = {}
+        self._origin = None  # Zeitpunkt des ältesten ausstehenden Updates (nur für metrics)
+        self._wakeup = asyncio.Event()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def publish(self, msg_type, channel, message):
+        """Remember the newest message for (msg_type, channel) until the next tick"""
+        if metrics.enabled and self._origin is None:
+            self._origin = time.perf_counter()
+        key = (msg_type, channel)
+        # Neu einreihen, damit ein Batch nach Version sortiert bleibt
+        self._pending.pop(key, None)
+        self._pending[key] = message
+        self._wakeup.set()
+
+    async def run(self):
+        """Flush pending updates as one frame, at most once per tick"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            messages = list(self._pending.values())
+            self._pending.clear()
+            origin, self._origin = self._origin, None
+            try:
+                self._flush(messages, origin=origin)
+            except Exception as e:
+                logger.error(f"Error flushing updates: {e}")
+
+            # Erst nach Ablauf des Takts wieder senden; neue Updates werden solange gesammelt
+            await asyncio.sleep(self._interval)
@@ -0,0 +1,157 @@
+"""
+X32 Simple Controller - Audio-Cues (Gong und weitere Ansagen)
+Autor: Christopher Gertig
+
+Alle Dateien aus audio/ werden einmal dekodiert und als pygame.mixer.Sound im
+Speicher gehalten. Abgespielt wird in einem eigenen Thread, der Event-Loop legt
+nur einen Befehl in dessen Warteschlange.
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections import deque
+
+from config import AUDIO_DIR, AUDIO_DRIVER, AUDIO_BUFFER, CUE_POLICY
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+# SDL soll SIGINT/SIGTERM nicht abfangen, sonst lässt sich der Prozess nicht beenden
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".flac")
+
+# "overlap" - zusätzlich zu laufenden Cues abspielen
+# "queue"   - nach den bereits laufenden bzw. wartenden Ansagen abspielen
+# "stop"    - alle laufenden Cues beenden und sofort abspielen
+CUE_POLICIES = ("overlap", "queue", "stop")
+
+# Kanal 0 ist für Ansagen reserviert ("queue"/"stop"), die übrigen für "overlap"
+MIXER_CHANNELS = 8
+
+
+class CueEngine:
+    def __init__(self, directory=AUDIO_DIR, driver=AUDIO_DRIVER, buffer=AUDIO_BUFFER):
+        self.directory = directory
+        self.error = None  # Fehlermeldung, falls das Audiogerät nicht verfügbar ist
+        self._driver = driver
+        self._buffer = buffer
+        self._names = []
+        self._files = {}
+        self._sounds = {}
+        self._commands = queue.Queue()
+        self._pending = deque()  # wartende Ansagen (nur im Worker-Thread benutzt)
+        self._thread = None
+
+    def start(self):
+        """Find the cue files and start the worker, which opens the mixer and loads them"""
+        try:
+            files = sorted(os.listdir(self.directory))
+        except OSError as e:
+            logger.error(f"Audio directory not readable: {e}")
+            files = []
+        self._files = {os.path.splitext(name)[0]: os.path.join(self.directory, name)
+                       for name in files if name.lower().endswith(AUDIO_EXTENSIONS)}
+        self._names = list(self._files)
+        self._thread = threading.Thread(target=self._run, name="cue-engine", daemon=True)
+        self._thread.start()
+
+    def cues(self):
+        """Names of all cues with their length in seconds (None while still loading)"""
+        return [{"name": name, "length": self._sounds[name].get_length() if name in self._sounds else None}
+                for name in self._names]
+
+    def has_cue(self, name):
+        return name in self._names
+
+    def play(self, name, policy=CUE_POLICY):
+        """Trigger a cue; returns immediately"""
+        if policy not in CUE_POLICIES:
+            raise ValueError(f"Unknown cue policy: {policy}")
+        if name not in self._names:
+            raise KeyError(name)
+        self._commands.put(("play", name, policy))
+
+    def stop(self, name=None):
+        """Stop one cue (including waiting announcements) or all cues"""
+        self._commands.put(("stop", name, None))
+
+    def close(self):
+        if self._thread is not None:
+            self._commands.put(None)
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _open(self):
+        import pygame
+        if self._driver:
+            os.environ["SDL_AUDIODRIVER"] = self._driver
+        # Kleiner Puffer: Verzögerung vom Auslösen bis zum Ton ist nur die Puffergröße
+        pygame.mixer.pre_init(buffer=self._buffer)
+        pygame.mixer.init()
+        pygame.mixer.set_num_channels(MIXER_CHANNELS)
+        pygame.mixer.set_reserved(1)
+        self._announce = pygame.mixer.Channel(0)
+        for name in self._names:
+            try:
+                self._sounds[name] = pygame.mixer.Sound(self._files[name])
+            except pygame.error as e:
+                logger.error(f"Could not load cue {name}: {e}")
+        logger.info("Loaded %d cues: %s", len(self._sounds), ", ".join(self._sounds))
+
+    def _run(self):
+        # pygame erst im Cue-Thread laden, das verkürzt den Start des Webservers
+        import pygame
+        try:
+            self._open()
+        except pygame.error as e:
+            self.error = str(e)
+            logger.error(f"Audio output not available: {e}")
+
+        while True:
+            try:
+                # Solange Ansagen warten, regelmäßig prüfen, ob Kanal 0 frei ist
+                command = self._commands.get(timeout=0.02 if self._pending else None)
+            except queue.Empty:
+                command = ()
+            if command is None:
+                break
+            if command and self.error is None:
+                try:
+                    self._execute(*command)
+                except pygame.error as e:
+                    logger.error(f"Error playing cue: {e}")
+            if self._pending and not self._announce.get_busy():
+                self._announce.play(self._pending.popleft())
+
+        if self.error is None:
+            pygame.mixer.quit()
+
+    def _execute(self, action, name, policy):
+        import pygame
+        if action == "stop":
+            if name is None:
+                self._pending.clear()
+                pygame.mixer.stop()
+            elif name in self._sounds:
+                sound = self._sounds[name]
+                self._pending = deque(s for s in self._pending if s is not sound)
+                sound.stop()
+            return
+
+        sound = self._sounds.get(name)
+        if sound is None:
+            logger.warning(f"Cue {name} could not be loaded")
+            return
+        logger.debug("Playing cue %s (%s)", name, policy)
+        if policy == "overlap":
+            # Sind alle Kanäle belegt, wird der am längsten laufende übernommen
+            pygame.mixer.find_channel(True).play(sound)
+        elif policy == "queue":
+            self._pending.append(sound)
+        else:
+            self._pending.clear()
+            pygame.mixer.stop()
+            self._announce.play(sound)
@@ -0,0 +1,182 @@
+"""
+X32 Simple Controller - Automatisches Ducking anhand der Meter-Daten
+Autor: Christopher Gertig
+
+Eine Regel senkt einen Fader (z.B. HDMI) um reduction dB ab, solange einer ihrer
+Auslöser-Kanäle (z.B. die Mikrofone) über threshold liegt. Absenken dauert attack,
+nach dem letzten Signal wird hold lang gewartet und dann über release zurückgefahren.
+Alle Regeln werden direkt beim Eintreffen eines Meter-Frames auf dem Event-Loop
+ausgewertet, ohne eigenen Task oder Thread.
+"""
+
+import logging
+
+import numpy as np
+
+from outbound import ECHO_TOLERANCE
+
+logger = logging.getLogger(__name__)
+
+# Längster Zeitschritt pro Frame; nach Lücken im Meter-Strom springt der Fader nicht
+MAX_STEP = 0.2
+
+
+def fader_to_db(value):
+    """X32 fader position (0.0-1.0) -> dB (-inf to +10)"""
+    if value >= 0.5:
+        return value * 40.0 - 30.0
+    if value >= 0.25:
+        return value * 80.0 - 50.0
+    if value >= 0.0625:
+        return value * 160.0 - 70.0
+    if value > 0.0:
+        return value * 480.0 - 90.0
+    return float("-inf")
+
+
+def db_to_fader(db):
+    """dB -> X32 fader position, inverse of fader_to_db"""
+    if db >= -10.0:
+        return min(1.0, (db + 30.0) / 40.0)
+    if db >= -30.0:
+        return (db + 50.0) / 80.0
+    if db >= -60.0:
+        return (db + 70.0) / 160.0
+    return max(0.0, (db + 90.0) / 480.0)
+
+
+# Eine Ducking-Regel mit ihrem aktuellen Zustand
+class DuckingRule:
+    def __init__(self, target, path, triggers, indices, threshold=-40.0, reduction=15.0,
+                 attack=0.05, hold=1.0, release=1.5, enabled=True):
+        if not indices:
+            raise ValueError(f"Ducking rule for {target} has no triggers")
+        if min(attack, hold, release) < 0 or reduction <= 0:
+            raise ValueError(f"Ducking rule for {target}: times must be >= 0 and reduction > 0")
+        self.target = target
+        self.path = path
+        self.triggers = list(triggers)
+        self.indices = np.asarray(indices)  # Positionen der Auslöser in der Meter-Bank
+        self.threshold = threshold
+        self.reduction = reduction
+        self.attack = attack
+        self.hold = hold
+        self.release = release
+        self.enabled = enabled
+        self.amount = 0.0        # 0 = nicht abgesenkt, 1 = voll abgesenkt
+        self.base = None         # Faderwert vor dem Absenken
+        self.sent = None         # zuletzt gesetzter Faderwert
+        self.last_signal = None  # Zeit des letzten Frames über der Schwelle
+        self.overridden = False  # Fader von Hand verstellt: bis zur nächsten Pause nicht absenken
+
+    def status(self):
+        if self.overridden:
+            state = "overridden"
+        elif self.amount <= 0.0:
+            state = "idle"
+        elif self.amount >= 1.0:
+            state = "ducked"
+        else:
+            state = "ramping"
+        return {"target": self.target, "triggers": self.triggers, "enabled": self.enabled,
+                "state": state, "amount": round(self.amount, 3),
+                "threshold": self.threshold, "reduction": self.reduction,
+                "attack": self.attack, "hold": self.hold, "release": self.release}
+
+
+# Alle Regeln; set_value(path, value) und get_value(path) kommen von der X32-Verbindung
+class DuckingEngine:
+    def __init__(self, rules, set_value, get_value):
+        self.rules = rules
+        self._set_value = set_value
+        self._get_value = get_value
+        self._last_frame = None
+
+    @property
+    def active(self):
+        """True while any rule needs the meter stream"""
+        return any(rule.enabled for rule in self.rules)
+
+    def get(self, target):
+        return next((rule for rule in self.rules if rule.target == target), None)
+
+    def set_enabled(self, rule, enabled):
+        """Switch a rule on or off; switching off restores the fader right away"""
+        rule.enabled = enabled
+        if not enabled and rule.base is not None:
+            self._finish(rule)
+
+    def process(self, meters_db, now):
+        """Evaluate every rule for one meter frame (dB levels of the trigger bank)"""
+        step = MAX_STEP if self._last_frame is None else min(MAX_STEP, now - self._last_frame)
+        self._last_frame = now
+        for rule in self.rules:
+            if not rule.enabled:
+                continue
+            try:
+                self._process_rule(rule, meters_db, now, step)
+            except Exception as e:
+                logger.error(f"Error in ducking rule for {rule.target}: {e}")
+
+    def _process_rule(self, rule, meters_db, now, step):
+        if len(meters_db) <= rule.indices.max():
+            return
+        if float(np.max(meters_db[rule.indices])) >= rule.threshold:
+            rule.last_signal = now
+        signal = rule.last_signal is not None and now - rule.last_signal <= rule.hold
+
+        if rule.overridden:
+            # Erst nach einer Pause der Auslöser wieder automatisch absenken
+            rule.overridden = signal
+            return
+
+        current = self._get_value(rule.path)
+        if rule.sent is not None and current is not None and abs(current - rule.sent) > ECHO_TOLERANCE:
+            # Jemand hat den Fader während des Duckings bewegt: seine Einstellung gilt
+            logger.info("Ducking of %s overridden by a manual fader move", rule.target)
+            rule.amount, rule.base, rule.sent = 0.0, None, None
+            rule.overridden = signal
+            return
+
+        if signal:
+            amount = min(1.0, rule.amount + step / rule.attack) if rule.attack > 0 else 1.0
+        else:
+            amount = max(0.0, rule.amount - step / rule.release) if rule.release > 0 else 0.0
+        if amount == rule.amount:
+            return
+        if rule.base is None:
+            if current is None:
+                return  # Faderstand noch unbekannt
+            rule.base = current
+        rule.amount = amount
+        if amount <= 0.0:
+            self._finish(rule)
+            return
+        value = db_to_fader(fader_to_db(rule.base) - rule.reduction * amount)
+        if rule.sent is None or abs(value - rule.sent) > ECHO_TOLERANCE / 2:
+            rule.sent = value
+            self._set_value(rule.path, value)
+
+    def _finish(self, rule):
+        # Genau den Ausgangswert wiederherstellen
+        self._set_value(rule.path, rule.base)
+        rule.amount, rule.base, rule.sent = 0.0, None, None
+
+
+def build_ducking_rules(configs, command_paths, channel_mapping):
+    """DuckingRule objects from DUCKING_RULES in config.py; raises ValueError on unknown channels"""
+    rules = []
+    for config in configs:
+        config = dict(config)
+        target = config.pop("target")
+        triggers = config.pop("triggers")
+        path = command_paths.get(("fader", target))
+        if path is None:
+            raise ValueError(f"Unknown ducking target: {target}")
+        unknown = [name for name in triggers if name not in channel_mapping]
+        if unknown:
+            raise ValueError(f"Unknown ducking triggers: {', '.join(unknown)}")
+        # Eingang n steht an Position n-1 von /meters/0
+        indices = [channel_mapping[name] - 1 for name in triggers]
+        rules.append(DuckingRule(target, path, triggers, indices, **config))
+    return rules
@@ -0,0 +1,110 @@
+"""
+X32 Simple Controller - Zeitgesteuerte Fades auf dem Server
+Autor: Christopher Gertig
+
+Ein Fade braucht vom Client nur einen Befehl; die Zwischenwerte entstehen hier
+in einem festen Takt. Alle laufenden Fades teilen sich einen Job im TimerScheduler.
+"""
+
+import logging
+import time
+from collections import deque
+
+from config import FADE_TICK, FADE_MAX_DURATION
+from outbound import ECHO_TOLERANCE
+
+logger = logging.getLogger(__name__)
+
+# Verlauf über die Zeit t (0..1) -> Anteil des Weges (0..1)
+FADE_CURVES = {
+    "linear": lambda t: t,
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: 1.0 - (1.0 - t) ** 2,
+    "s_curve": lambda t: t * t * (3.0 - 2.0 * t),
+}
+
+# So viele zuletzt gesendete Werte je Fade gelten noch als Echo
+FADE_ECHO_HISTORY = 32
+
+
+class _Fade:
+    __slots__ = ("start_value", "target", "started", "duration", "curve", "recent")
+
+    def __init__(self, start_value, target, started, duration, curve):
+        self.start_value = start_value
+        self.target = target
+        self.started = started
+        self.duration = duration
+        self.curve = curve
+        self.recent = deque(maxlen=FADE_ECHO_HISTORY)
+
+    def value_at(self, now):
+        if self.duration <= 0:
+            return self.target, True
+        progress = min(1.0, (now - self.started) / self.duration)
+        shaped = FADE_CURVES[self.curve](progress)
+        return self.start_value + (self.target - self.start_value) * shaped, progress >= 1.0
+
+
+# Alle laufenden Fades; apply(changes) sendet die Werte eines Takts gemeinsam
+class FadeEngine:
+    def __init__(self, scheduler, apply, tick=FADE_TICK):
+        self._scheduler = scheduler
+        self._apply = apply
+        self._tick = tick
+        self._fades = {}  # OSC-Pfad -> _Fade
+
+    def start(self, path, start_value, target, duration, curve="linear"):
+        """Fade path from start_value to target over duration seconds; replaces a running fade"""
+        if curve not in FADE_CURVES:
+            raise ValueError(f"Unknown curve: {curve} (available: {', '.join(FADE_CURVES)})")
+        if not 0.0 <= target <= 1.0:
+            raise ValueError("Target level must be between 0 and 1")
+        if not 0.0 <= duration <= FADE_MAX_DURATION:
+            raise ValueError(f"Duration must be between 0 and {FADE_MAX_DURATION} seconds")
+        self._fades[path] = _Fade(start_value, target, time.monotonic(), duration, curve)
+        logger.debug("Fade %s %.3f -> %.3f in %.1f s (%s)", path, start_value, target, duration, curve)
+        if not self._scheduler.is_active("fades"):
+            self._scheduler.every("fades", self._tick, self._step, delay=self._tick)
+        self._step()
+
+    def cancel(self, path):
+        """Stop a fade where it is; returns True if one was running"""
+        return self._fades.pop(path, None) is not None
+
+    def cancel_all(self):
+        self._fades.clear()
+        self._scheduler.cancel("fades")
+
+    def active(self):
+        """Running fades as {path: (target, seconds remaining)}"""
+        now = time.monotonic()
+        return {path: (fade.target, max(0.0, fade.started + fade.duration - now))
+                for path, fade in self._fades.items()}
+
+    def fader_moved(self, path, value):
+        """Inbound fader value from the console: cancel the fade unless it is our own value
+        Returns True if a fade was cancelled.
+        """
+        fade = self._fades.get(path)
+        if fade is None:
+            return False
+        if any(abs(value - sent) <= ECHO_TOLERANCE for sent in fade.recent):
+            return False
+        logger.info("Fade on %s cancelled, fader moved on the console", path)
+        del self._fades[path]
+        return True
+
+    def _step(self):
+        now = time.monotonic()
+        changes = []
+        for path, fade in list(self._fades.items()):
+            value, finished = fade.value_at(now)
+            fade.recent.append(value)
+            changes.append((path, value))
+            if finished:
+                del self._fades[path]
+        if changes:
+            self._apply(changes)
+        if not self._fades:
+            self._scheduler.cancel("fades")
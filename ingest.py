@@ -0,0 +1,206 @@
+"""
+X32 Simple Controller - Ingest-Prozess für den Betrieb mit mehreren Workern
+Autor: Christopher Gertig
+
+Bei WORKERS > 1 in config.py besitzt genau ein Prozess (dieser) die Verbindung
+zum X32, den Zustandsspiegel, den Meter-Verlauf und die Audio-Cues. Die
+HTTP/WebSocket-Worker (uvicorn --workers) verbinden sich über eine lokale
+TCP-Verbindung, bekommen alle Updates und Meter-Frames und schicken Befehle
+der Clients zurück.
+
+Start: python main.py (startet Ingest und Worker gemeinsam) oder einzeln:
+    python ingest.py
+    uvicorn main:app --host 0.0.0.0 --port 8000 --workers 4
+
+Jede Nachricht auf der Verbindung: uint8 Typ, uint32 Länge (little-endian), Daten.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import signal
+import struct
+
+from config import INGEST_HOST, INGEST_PORT
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct("<BI")
+FRAME_TEXT = 0    # JSON-Text: Broadcast an die Clients bzw. Befehl eines Workers
+FRAME_BINARY = 1  # binäres Meter-Frame (Format siehe meters.py)
+FRAME_REPLY = 2   # JSON-Antwort auf einen Endpunkt-Aufruf oder Befehle eines Workers
+
+# Wartezeiten (Sekunden) zwischen Verbindungsversuchen eines Workers
+RECONNECT_DELAYS = (0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+def encode_frame(kind, payload):
+    return FRAME_HEADER.pack(kind, len(payload)) + payload
+
+
+async def read_frame(reader):
+    """Read one frame; raises IncompleteReadError when the peer is gone"""
+    kind, length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+# Ingest-Seite: verhält sich gegenüber ClientConnection wie ein WebSocket,
+# damit ein Worker Puffer und Überlaufverhalten eines normalen Clients bekommt
+class WorkerSocket:
+    def __init__(self, writer):
+        self._writer = writer
+
+    async def send_text(self, text):
+        self._writer.write(encode_frame(FRAME_TEXT, text.encode()))
+        await self._writer.drain()
+
+    async def send_bytes(self, data):
+        self._writer.write(encode_frame(FRAME_BINARY, data))
+        await self._writer.drain()
+
+    def reply(self, message):
+        # Ein write() pro Frame, daher keine Vermischung mit dem Sende-Task
+        self._writer.write(encode_frame(FRAME_REPLY, json.dumps(message).encode()))
+
+    async def close(self, code=1000):
+        self._writer.close()
+
+
+# Worker-Seite: hält die Verbindung zum Ingest-Prozess und verbindet sich bei Bedarf neu
+class IngestLink:
+    def __init__(self, on_text, on_binary, on_lost=None, host=INGEST_HOST, port=INGEST_PORT, timeout=10.0):
+        self._on_text = on_text
+        self._on_binary = on_binary
+        self._on_lost = on_lost
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._writer = None
+        self._calls = {}  # Aufruf-ID -> Future
+        self._ids = itertools.count()
+        self._meters_wanted = False
+        self._console_wanted = False
+
+    @property
+    def connected(self):
+        return self._writer is not None
+
+    def send(self, message):
+        """Send a client command to the ingest process; dropped while disconnected"""
+        if self._writer is None:
+            logger.error("Not connected to ingest process")
+            return False
+        self._writer.write(encode_frame(FRAME_TEXT, json.dumps(message).encode()))
+        return True
+
+    def set_meters_wanted(self, wanted):
+        """Tell the ingest process whether any client of this worker shows meters"""
+        if wanted != self._meters_wanted:
+            self._meters_wanted = wanted
+            if self._writer is not None:
+                self.send({"type": "meters_view", "active": wanted})
+
+    def set_console_wanted(self, wanted):
+        """Tell the ingest process whether this worker has any clients at all"""
+        if wanted != self._console_wanted:
+            self._console_wanted = wanted
+            if self._writer is not None:
+                self.send({"type": "console_view", "active": wanted})
+
+    def request(self, message):
+        """Send a message that the ingest process answers with a reply frame;
+        returns a future for the reply (ConnectionError while disconnected)
+        """
+        if self._writer is None:
+            raise ConnectionError("Not connected to ingest process")
+        call_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._calls[call_id] = future
+        future.add_done_callback(lambda _: self._calls.pop(call_id, None))
+        self.send(dict(message, id=call_id))
+        return future
+
+    async def call(self, endpoint, kwargs):
+        """Run an endpoint in the ingest process; returns its reply"""
+        future = self.request({"type": "call", "endpoint": endpoint, "kwargs": kwargs})
+        return await asyncio.wait_for(future, self._timeout)
+
+    async def run(self):
+        """Connect and receive until cancelled, reconnecting with backoff"""
+        attempt = 0
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self._host, self._port)
+            except OSError as e:
+                delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+                attempt += 1
+                logger.warning("Ingest process not reachable (%s), retrying in %.1f s", e, delay)
+                await asyncio.sleep(delay)
+                continue
+            attempt = 0
+            self._writer = writer
+            logger.info("Connected to ingest process at %s:%d", self._host, self._port)
+            if self._meters_wanted:
+                self.send({"type": "meters_view", "active": True})
+            if self._console_wanted:
+                self.send({"type": "console_view", "active": True})
+            try:
+                await self._receive(reader)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                logger.warning(f"Lost connection to ingest process: {e}")
+            finally:
+                self._writer = None
+                writer.close()
+                for future in list(self._calls.values()):
+                    if not future.done():
+                        future.set_exception(ConnectionError("Lost connection to ingest process"))
+                if self._on_lost is not None:
+                    self._on_lost()
+
+    async def _receive(self, reader):
+        while True:
+            kind, payload = await read_frame(reader)
+            try:
+                if kind == FRAME_TEXT:
+                    self._on_text(payload.decode())
+                elif kind == FRAME_BINARY:
+                    self._on_binary(payload)
+                elif kind == FRAME_REPLY:
+                    reply = json.loads(payload)
+                    future = self._calls.get(reply["id"])
+                    if future is not None and not future.done():
+                        future.set_result(reply)
+            except Exception as e:
+                logger.error(f"Error handling frame from ingest process: {e}")
+
+
+async def run_ingest():
+    """Own the X32 connection and serve the worker processes"""
+    import main
+    # SIGTERM vom Hauptprozess (main.py) oder Strg+C: Server schließen und aufräumen
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # z.B. Windows: dort beendet KeyboardInterrupt den Prozess
+    await main.start_core()
+    try:
+        server = await asyncio.start_server(main.handle_worker, INGEST_HOST, INGEST_PORT)
+        logger.info("Ingest process listening on %s:%d", INGEST_HOST, INGEST_PORT)
+        await stop.wait()
+        logger.info("Ingest process stopping")
+        # Nicht auf die Worker-Verbindungen warten; sie enden mit dem Prozess
+        server.close()
+    finally:
+        # Wie das Ende des lifespan im Einzelprozess: Mitschnitt schreiben, Audio schließen
+        await main.stop_core()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_ingest())
+    except KeyboardInterrupt:
+        pass
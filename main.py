@@ -6,162 +6,348 @@ Erstellt: Dezember 2024
 
 # Import der benötigten Bibliotheken
 from fastapi import FastAPI, WebSocket
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from starlette.websockets import WebSocketDisconnect
-from pythonosc import udp_client, dispatcher, osc_server
+from pythonosc import dispatcher
 import json
 import logging
 import asyncio
-import time
 import socket
-from threading import Thread
-import queue
-from collections import namedtuple
-from config import X32_IP, X32_PORT, CHANNEL_MAPPING, LOCAL_PORT
-from queue import Queue
-import pygame
-from fastapi import FastAPI, Response
-from fastapi.responses import JSONResponse
-import math
+from config import (X32_IP, X32_PORT, CHANNEL_MAPPING, LOCAL_PORT, METER_BANKS, LOG_LEVEL,
+                    X32_KEEPALIVE_INTERVAL, SUBSCRIPTION_RENEW_INTERVAL, METER_RENEW_INTERVAL, CUE_POLICY,
+                    METER_HISTORY_SECONDS, METER_HISTORY_RATE, METER_PEAK_HOLD, METER_CLIP_DB,
+                    WORKERS, WORKER_QUEUE_SIZE, X32_CONNECT_TIMEOUT, X32_CONNECTION_TIMEOUT,
+                    X32_RECONNECT_DELAY, X32_RECONNECT_MAX_DELAY, PRESETS_FILE, X32_ECHO_WINDOW,
+                    CONSOLE_SUBSCRIPTION_FACTOR, X32_READ_BATCH, X32_READ_INTERVAL,
+                    CAPTURE_FILE, CAPTURE_FLUSH_INTERVAL, DUCKING_RULES, DUCKING_METER_BANK,
+                    COMMAND_BATCH_LIMIT)
+from osc_transport import X32Protocol, build_bundle
+from outbound import OutboundScheduler
+from scheduler import TimerScheduler
+from clients import ClientConnection
+from conflation import UpdateConflator, encode_updates
+from routing import build_routes, build_command_paths, build_console_paths, partition_subscriptions
+from state import MixerState
+from meters import (decode_meter_blob, levels_to_db, encode_meter_frame, decode_meter_frame,
+                    MAIN_LR_BANK, MAIN_LR_INDEX)
+from ingest import IngestLink, WorkerSocket, read_frame
+from meter_history import MeterHistory
+from presets import PresetStore
+from subscriptions import SubscriptionBlock
+from fades import FadeEngine
+from cues import CueEngine
+from static_assets import build_assets, asset_response
+from topics import TopicFilter
+from capture import CaptureLog
+from ducking import DuckingEngine, build_ducking_rules
+from commands import CommandSchema, COMMAND_TYPES, command_error
+import functools
+import itertools
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response, Body
+from fastapi.responses import JSONResponse, PlainTextResponse
+import time
 import struct
+import metrics
+import subprocess
+import sys
+import os
 
-# Logging auf kritische Fehler beschränken
+# Logging standardmäßig auf kritische Fehler beschränken (LOG_LEVEL in config.py)
 logging.basicConfig(
-    level=logging.CRITICAL,  # Nur kritische Fehler werden geloggt
+    level=LOG_LEVEL,
     format='%(message)s'     # Vereinfachtes Format ohne Zeitstempel
 )
 logger = logging.getLogger(__name__)
 
-# Initialisierung der FastAPI-Anwendung und Einbindung der statischen Dateien
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Start und Ende der Anwendung; die Verbindung zum X32 wird dabei nur angestoßen,
+# damit Weboberfläche und statische Dateien sofort erreichbar sind
+@asynccontextmanager
+async def lifespan(app):
+    # Statische Dateien einmal pro Prozess hashen und komprimieren
+    static_files.update(build_assets("static"))
+    if WORKERS > 1:
+        asyncio.create_task(ingest_link.run())
+    else:
+        await start_core()
+        print("\nX32 Simple Controller bereit!")
+        print("Öffnen Sie http://localhost:8000 im Browser\n")
+    yield
+    if WORKERS == 1:
+        await stop_core()
+
+# Initialisierung der FastAPI-Anwendung; statische Dateien kommen aus static_files
+app = FastAPI(lifespan=lifespan)
+static_files = {}  # URL -> Asset, gefüllt beim Start
 connected_clients = []
-update_queue = Queue()
 
-# Broadcast-Funktion zum Senden von Nachrichten an alle verbundenen WebSocket-Clients
-async def broadcast_message(message: str):
-    if not message:
+# Zustands-Updates eines Takts an alle Clients; die Nachricht landet nur im Sendepuffer,
+# das Senden übernimmt der Sende-Task des Clients. Clients ohne Themen-Abo teilen sich ein
+# einmal kodiertes Frame, die übrigen filtern und drosseln über ihren TopicFilter
+def broadcast_updates(messages, origin=None, frame=None):
+    for client in list(connected_clients):
+        if client.topics is not None:
+            client.topics.offer(messages, origin)
+            continue
+        if frame is None:
+            frame = encode_updates(messages)
+        if not client.send(frame, None, origin) and client in connected_clients:
+            connected_clients.remove(client)
+
+# Updates werden pro (Typ, Kanal) zusammengefasst und gebündelt gesendet
+conflator = UpdateConflator(broadcast_updates)
+
+def shows_meters(client):
+    """Client displays meters right now and has not unsubscribed from them"""
+    return client.wants_meters and (client.topics is None or "meters" in client.topics)
+
+# Meter-Daten gehen direkt an die Clients, je nach Client als JSON (nur Main LR)
+# oder als binäres Frame der ganzen Bank; jedes Format wird höchstens einmal kodiert
+def broadcast_meters(bank, meters_db, message=None, binary_frame=None):
+    origin = time.perf_counter() if metrics.enabled else None
+    json_frame = None
+    for client in list(connected_clients):
+        if not shows_meters(client):
+            continue
+        if client.topics is not None and not client.topics.allow_meters(bank):
+            continue
+        if client.binary_meters:
+            if binary_frame is None:
+                binary_frame = encode_meter_frame(bank, meters_db)
+            frame = binary_frame
+        elif message is not None:
+            if json_frame is None:
+                json_frame = json.dumps(message)
+            frame = json_frame
+        else:
+            continue
+        if not client.send(frame, ("meters", bank), origin) and client in connected_clients:
+            connected_clients.remove(client)
+
+def main_lr_message(meters_db):
+    """JSON meter message for Main LR (-inf is sent as null, JSON has no -Infinity)"""
+    left_db, right_db = (float(meters_db[i]) for i in MAIN_LR_INDEX)
+    return {
+        "type": "meters",
+        "left": left_db if left_db > float('-inf') else None,
+        "right": right_db if right_db > float('-inf') else None
+    }
+
+# Meter-Verlauf je Bank, angelegt beim ersten Frame (Größe fest, unabhängig von der Laufzeit)
+meter_history = {}
+
+def record_meter_history(bank, meters_db):
+    history = meter_history.get(bank)
+    if history is None or history.count != len(meters_db):
+        history = MeterHistory(int(METER_HISTORY_SECONDS * METER_HISTORY_RATE), len(meters_db),
+                               peak_hold=METER_PEAK_HOLD, clip_db=METER_CLIP_DB)
+        meter_history[bank] = history
+    history.record(meters_db, time.time())
+
+# Meter-Abfragen am X32 laufen nur, solange mindestens ein Client Meter anzeigt
+# oder der Meter-Verlauf aufgezeichnet wird; die /formatsubscribe-Abos nur, solange
+# überhaupt ein Client verbunden ist (ohne Clients hält /xremote den Spiegel aktuell)
+def update_subscriptions():
+    wanted = any(shows_meters(client) for client in connected_clients)
+    watched = any(client.wants_console for client in connected_clients)
+    if WORKERS > 1 and not ingest_process:
+        # Worker: der Ingest-Prozess entscheidet für alle Worker gemeinsam
+        ingest_link.set_meters_wanted(wanted)
+        ingest_link.set_console_wanted(watched)
         return
-        
-    logger.debug(f"Broadcasting message to {len(connected_clients)} clients: {message}")
-    # Konvertiere zu Liste um Modifikation während der Iteration zu vermeiden
-    clients = list(connected_clients)
-    for client in clients:
-        try:
-            await client.send_text(message)
-            logger.debug(f"Message sent successfully to client")
-        except Exception as e:
-            logger.error(f"Error sending to client: {e}")
-            if client in connected_clients:
-                connected_clients.remove(client)
+    x32.set_meters_active(METER_HISTORY_SECONDS > 0 or wanted or ducking.active)
+    x32.set_subscriptions_active(watched)
 
-# Verarbeitung der Nachrichten-Queue für asynchrone Kommunikation
-async def process_queue():
-    while True:
-        try:
-            # Warte auf neue Nachrichten in der Queue
-            message = await asyncio.get_event_loop().run_in_executor(None, update_queue.get)
-            logger.debug(f"Got message from queue: {message}")
-            if message:
-                await broadcast_message(message)
-        except Exception as e:
-            logger.error(f"Error processing queue: {e}")
-            await asyncio.sleep(0.1)
+# Audio-Cues (Gong usw.); Mixer und Sounds werden einmalig im Cue-Thread geladen
+cue_engine = CueEngine()
+
+# Bei WORKERS > 1 ist dieser Prozess entweder der Ingest-Prozess (ingest.py, besitzt
+# X32-Verbindung, Zustand und Audio) oder ein HTTP/WebSocket-Worker, der alles
+# über ingest_link bezieht
+ingest_process = False
+conflator_task = None
+
+async def start_core():
+    """Start everything that must exist exactly once: X32 link, broadcasts, audio"""
+    global ingest_process, conflator_task
+    ingest_process = WORKERS > 1
+    # Start the broadcast task
+    conflator_task = asyncio.create_task(conflator.run())
+    cue_engine.start()
+    preset_store.load()
+
+    # Meter-Verlauf braucht Meter-Daten auch ohne verbundene Clients
+    update_subscriptions()
+
+    # OSC-Transport auf dem Event-Loop öffnen; die Verbindung entsteht im Hintergrund
+    await x32.start()
+
+async def stop_core():
+    """Counterpart of start_core: stop the audio thread and the X32 link, write the capture"""
+    if conflator_task is not None:
+        conflator_task.cancel()
+    cue_engine.close()
+    await x32.stop()
+
+def publish_connection_state(state, **console):
+    """Tell all clients whether the X32 is connected (also part of every snapshot)"""
+    conflator.publish("connection", None, mixer_state.set_connection(state, console or None))
 
-@app.on_event("startup")
-async def startup_event():
-    # Start the queue processing task
-    asyncio.create_task(process_queue())
-    print("\nX32 Simple Controller bereit!")
-    print("Öffnen Sie http://localhost:8000 im Browser\n")
+# Ausgehende OSC-Pfade für Fader- und Mute-Befehle der Clients, einmalig berechnet
+COMMAND_PATHS = build_command_paths(CHANNEL_MAPPING)
+# Erlaubte Kanäle und Wertebereiche der Client-Befehle (siehe commands.py)
+command_schema = CommandSchema(COMMAND_PATHS, COMMAND_BATCH_LIMIT)
 
-# Start broadcast worker thread
-# broadcast_thread = Thread(target=broadcast_worker, daemon=True)
-# broadcast_thread.start()
+# Spiegel des Mischpult-Zustands; neue Clients bekommen ihn ohne Anfrage an das X32
+mixer_state = MixerState()
 
-# Definition einer Nachrichtenstruktur für empfangene OSC-Nachrichten
-ReceivedMessage = namedtuple("ReceivedMessage", "address, tags, data")
+# Gespeicherte Presets für Master und die zugeordneten Kanäle
+preset_store = PresetStore(PRESETS_FILE, ["master"] + list(CHANNEL_MAPPING))
+
+FLOAT32 = struct.Struct("<f")
+
+# Alle gespiegelten OSC-Pfade des Mischpults mit ihrem Typ
+CONSOLE_PATHS = build_console_paths()
+
+# Die Zahlenwerte davon als /formatsubscribe-Blöcke innerhalb der Abo-Grenze des X32
+CONSOLE_BLOCKS = [
+    SubscriptionBlock(f"hidden/console{index}", paths, [CONSOLE_PATHS[path] for path in paths])
+    for index, paths in enumerate(partition_subscriptions(CONSOLE_PATHS))
+]
 
 # Dispatcher-Klasse für die Verarbeitung von OSC-Nachrichten vom X32
 class X32Dispatcher(dispatcher.Dispatcher):
-    def __init__(self, queue):
+    def __init__(self, echo_filter=None, fader_moved=None, recently_sent=None, blocks=()):
         super().__init__()
-        self._queue = queue
+        self._echo_filter = echo_filter  # Erkennt Echos eigener Änderungen vom X32
+        self._fader_moved = fader_moved  # Meldet Faderbewegungen am Pult (beendet Fades)
+        self._recently_sent = recently_sent  # Pfade mit eigenen, noch nicht bestätigten Werten
+        self._blocks = {block.address: block for block in blocks}  # Abo-Antworten -> Block
+        self._waiters = {}  # OSC-Adresse -> Future für ausstehende Leseanfragen
         self._values = {}  # Speicherung der letzten Werte
+        self.last_received = 0.0  # monotonic()-Zeit der letzten Nachricht vom X32
         
-        # Registrierung spezifischer Handler
-        self.map("/xinfo", self._handle_xinfo)
-        self.map("/ch/*/mix/fader", self._handle_fader)
-        self.map("/ch/*/mix/on", self._handle_mute)  # Mute-Status für Kanäle
-        self.map("/main/st/mix/fader", self._handle_fader)
-        self.map("/main/st/mix/on", self._handle_mute)  # Mute-Status für Master
-        self.map("/meters/2", self._handle_meters)  # Hauptmeter LR (Index 19,20 im Array)
+        # Routing-Tabelle einmalig aufbauen: exakte OSC-Adresse -> (Handler, Kanalname)
+        handlers = {
+            "xinfo": self._handle_xinfo,
+            "fader": self._handle_fader,
+            "mute": self._handle_mute,
+            "name": self._handle_name,
+            "param": self._handle_param,
+            "meters": self._handle_meters,  # Alle Meter-Bänke, Main LR in /meters/2
+        }
+        self._routes = {
+            address: (handlers[kind], channel)
+            for address, (kind, channel) in build_routes(CHANNEL_MAPPING).items()
+        }
+        
+    def dispatch(self, message, client_address):
+        """Dispatch an OSC message with a single routing table lookup"""
+        self.last_received = time.monotonic()
+        # Antwort auf eine ausstehende Leseanfrage für genau diese Adresse
+        if self._waiters:
+            waiter = self._waiters.pop(message.address, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(message.params)
+        
+        route = self._routes.get(message.address)
+        if route is not None:
+            # Echos eigener Änderungen sind schon im Zustandsspiegel
+            if self._echo_filter is not None and self._echo_filter(message.address, message.params):
+                return
+            handler, channel = route
+            handler(message.address, channel, *message.params)
+            return
+        block = self._blocks.get(message.address)
+        if block is not None:
+            if message.params and isinstance(message.params[0], bytes):
+                self._handle_subscription(block, message.params[0])
+            return
+        # Adressen außerhalb der Tabelle über die per map() registrierten Muster
+        for handler in self.handlers_for_address(message.address):
+            handler.invoke(client_address, message)
+
+    def expect(self, address):
+        """Future resolved with the args of the next message for address
+        Concurrent readers of the same address share one future.
+        """
+        waiter = self._waiters.get(address)
+        if waiter is None or waiter.done():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[address] = waiter
+        return waiter
+
+    def record(self, address, value):
+        """Apply a value we sent ourselves as if the X32 had reported it"""
+        route = self._routes.get(address)
+        if route is not None:
+            # OSC überträgt float32; so gespeichert, wie das X32 den Wert später meldet
+            if isinstance(value, float):
+                value = FLOAT32.unpack(FLOAT32.pack(value))[0]
+            handler, channel = route
+            handler(address, channel, value)
         
     def get_value(self, address):
         """Get the last known value for an address"""
         return self._values.get(address)
+
+    def _handle_subscription(self, block, blob):
+        """Dispatch the values of a subscription reply that changed since the last one"""
+        for index, path, value in block.changes(blob):
+            # Das Abo kann noch den Stand vor einer eigenen Änderung liefern;
+            # der Wert wird mit der nächsten Antwort erneut geprüft
+            if self._recently_sent is not None and self._recently_sent(path):
+                block.forget(index)
+                continue
+            handler, channel = self._routes[path]
+            handler(path, channel, value)
+
+    def _handle_param(self, address, channel, *args):
+        # Farben und Matrix-Sends werden nur gespiegelt
+        self._values[address] = args[0] if args else None
+
+    def _handle_xinfo(self, address, channel, *args):
+        # Die Antwort selbst wird über expect("/xinfo") zugestellt
+        logger.debug("Received XINFO response: %s", args)
         
-    def _handle_xinfo(self, address, *args):
-        logger.debug(f"Received XINFO response: {args}")
-        self._queue.put({"address": address, "args": args})
-        
-    def _handle_fader(self, address, *args):
-        logger.debug(f"Received fader update: {address} = {args}")
-        value = args[0] if args else None
-        self._values[address] = value
-        
-        # Create WebSocket update message
-        if address == "/main/st/mix/fader":
-            channel = "master"
-        else:
-            # Extract channel number from path
-            channel_num = int(address.split('/')[2])
-            # Find channel name from mapping
-            channel = next((name for name, num in CHANNEL_MAPPING.items() if num == channel_num), None)
-            if channel is None:
-                return
+    def _handle_fader(self, address, channel, *args):
+        logger.debug("Received fader update: %s = %s", address, args)
+        if self._fader_moved is not None and args:
+            self._fader_moved(address, args[0])
+        self._update_state("fader", address, channel, args)
         
-        # Send update to all connected clients
-        message = {
-            "type": "fader",
-            "channel": channel,
-            "value": value
-        }
+    def _handle_mute(self, address, channel, *args):
+        """Handle mute updates"""
+        logger.debug("Received mute update: %s = %s", address, args)
+        self._update_state("mute", address, channel, args)
         
-        # Put message in queue instead of direct send
-        logger.debug(f"Putting fader message in queue: {json.dumps(message)}")
-        update_queue.put(json.dumps(message))
+    def _handle_name(self, address, channel, *args):
+        """Handle channel names set on the console"""
+        self._update_state("name", address, channel, args)
         
-    def _handle_mute(self, address, *args):
-        """Handle mute updates"""
-        logger.debug(f"Received mute update: {address} = {args}")
+    def _update_state(self, kind, address, channel, args):
         value = args[0] if args else None
         self._values[address] = value
         
-        # Create WebSocket update message
-        if address == "/main/st/mix/on":
-            channel = "master"
-        else:
-            # Extract channel number from path
-            channel_num = int(address.split('/')[2])
-            # Find channel name from mapping
-            channel = next((name for name, num in CHANNEL_MAPPING.items() if num == channel_num), None)
-            if channel is None:
-                return
+        # Nicht zugeordnete Kanäle werden nur gespeichert
+        if channel is None:
+            return
+        
+        # Nur echte Änderungen erhöhen die Version und gehen an die Clients
+        version = mixer_state.update(kind, channel, value)
+        if version is None:
+            return
         
         # Send update to all connected clients
         message = {
-            "type": "mute",
+            "type": kind,
             "channel": channel,
-            "value": value
+            "value": value,
+            "version": version
         }
         
-        # Put message in queue instead of direct send
-        logger.debug(f"Putting mute message in queue: {json.dumps(message)}")
-        update_queue.put(json.dumps(message))
+        conflator.publish(kind, channel, message)
         
-    def _handle_meters(self, address, *args):
+    def _handle_meters(self, address, channel, *args):
         """Handle meter data from X32
         Format: <meter id> ,b~~<int1><int2><nativefloat>...<nativefloat>
         int1: length of blob in bytes (32 bits big-endian)
@@ -172,236 +358,301 @@ class X32Dispatcher(dispatcher.Dispatcher):
             if not args or not isinstance(args[0], bytes):
                 return
                 
-            blob = args[0]
-            # Log the raw blob data
-            logger.debug(f"Complete raw blob data: {' '.join([f'{b:02x}' for b in blob])}")
-            logger.debug(f"Blob length: {len(blob)} bytes")
-            
-            # Skip the first 4 bytes (header)
-            data = blob[4:]
+            # Gesamte Bank auf einmal dekodieren und in dB umrechnen
+            # Die Werte kommen als 0.0 - 1.0, wobei 1.0 = 0 dB entspricht
+            started = time.perf_counter() if metrics.enabled else None
+            levels = decode_meter_blob(args[0])
+            meters_db = levels_to_db(levels)
+            if started is not None:
+                metrics.meter_decode.observe(time.perf_counter() - started)
+            if address == DUCKING_METER_BANK and ducking.active:
+                # Vor allem anderen, damit der Fader noch im selben Meter-Takt reagiert
+                ducking.process(meters_db, time.monotonic())
+            if METER_HISTORY_SECONDS > 0:
+                record_meter_history(address, meters_db)
+            if address not in METER_BANKS:
+                return  # nur fürs Ducking abgefragt
             
-            # Read all floats for debugging
-            all_floats = []
-            for i in range(0, min(len(data), 96), 4):  # Read first 24 floats
-                value = struct.unpack('<f', data[i:i+4])[0]
-                all_floats.append(value)
-            logger.debug(f"First 24 float values: {all_floats}")
+            if address != MAIN_LR_BANK or len(meters_db) <= max(MAIN_LR_INDEX):
+                broadcast_meters(address, meters_db)
+                return
             
             # Main LR sind an Position 16,22 im Array (nach dem Header)
-            left_raw = all_floats[16] if len(all_floats) > 16 else 0
-            right_raw = all_floats[22] if len(all_floats) > 22 else 0
-            
-            # Debug der Rohwerte
-            logger.debug(f"Raw meter values - Left: {left_raw}, Right: {right_raw}")
-            
-            # Konvertiere die Werte in dB (-inf bis 0)
-            # Die Werte kommen als 0.0 - 1.0, wobei 1.0 = 0 dB entspricht
-            left_db = 20 * math.log10(left_raw) if left_raw > 0 else float('-inf')
-            right_db = 20 * math.log10(right_raw) if right_raw > 0 else float('-inf')
-            
-            # Debug der dB-Werte
-            logger.debug(f"dB values - Left: {left_db}, Right: {right_db}")
+            left_db, right_db = (float(meters_db[i]) for i in MAIN_LR_INDEX)
             
             # Store values and send update
             self._values[address] = {"left": left_db, "right": right_db}
-            message = json.dumps({
-                "type": "meters",
-                "left": left_db,
-                "right": right_db
-            })
-            logger.debug(f"Putting meter message in queue: {message}")
-            update_queue.put(message)
+            message = main_lr_message(meters_db)
+            mixer_state.update_meters(message["left"], message["right"])
+            broadcast_meters(address, meters_db, message)
             
         except Exception as e:
             logger.error(f"Error parsing meter data: {e}")
         
-    def handle_message(self, address, *args):
-        logger.debug(f"Received OSC message: {address} {args}")
-        self._queue.put({"address": address, "args": args})
+
+# Abonnements per /formatsubscribe: Alias -> (OSC-Pfade, Start, Ende, Zeitfaktor)
+# Der X32 beendet Abos nach 10 Sekunden, sie werden per /renew <Alias> verlängert
+SUBSCRIPTIONS = {
+    # Fader, Mutes, Farben und Matrix-Sends des ganzen Mischpults, aufgeteilt in Blöcke
+    **{block.alias: (block.paths, 0, 0, CONSOLE_SUBSCRIPTION_FACTOR) for block in CONSOLE_BLOCKS},
+    # General state updates as seen in Wireshark
+    "hidden/states": (
+        ["/-stat/tape/state", "/-usb/path", "/-usb/title", "/-stat/tape/etime",
+         "/-stat/tape/rtime", "/-stat/aes50/state", "/-stat/aes50/A", "/-stat/aes50/B",
+         "/-show/prepos/current", "/-stat/usbmounted", "/-usb/dir/dirpos", "/-usb/dir/maxpos",
+         "/-stat/xcardtype", "/-stat/xcardsync", "/-stat/rtasource", "/-stat/talk/A",
+         "/-stat/talk/B", "/-stat/osc/on", "/-stat/keysolo", "/-stat/urec/state",
+         "/-stat/urec/etime", "/-stat/urec/rtime"],
+        0, 0, 4
+    ),
+}
 
 # X32-Verbindungs-Klasse für die Kommunikation mit dem X32
 class X32Connection:
     def __init__(self, x32_address, server_port, timeout=10):
         self._timeout = timeout
-        self._input_queue = queue.Queue()
         self._connected = False
         self._x32_address = x32_address
         self._server_port = server_port
-        
-        logger.info(f"Initializing X32 connection to {x32_address}:{X32_PORT}")
+        self._outbound = OutboundScheduler(self._send_packet)
+        # Ein Timer für Keepalive, Abo-Verlängerung, Meter-Abfragen und Fades
+        self._scheduler = TimerScheduler()
+        self.fades = FadeEngine(self._scheduler, self._apply_fade_step)
+        self._dispatcher = X32Dispatcher(echo_filter=self._outbound.is_echo,
+                                         fader_moved=self._on_console_fader,
+                                         recently_sent=self._outbound.is_recent,
+                                         blocks=CONSOLE_BLOCKS)
+        self._transport = None
+        self._client = None
+        self._outbound_task = None
+        self._scheduler_task = None
+        self._meters_active = False
+        self._subscriptions_active = False
+        self._meter_banks = []  # zuletzt mit /meters angeforderte Bänke
+        self._reconnect_delay = X32_RECONNECT_DELAY
+        self.capture = CaptureLog(CAPTURE_FILE) if CAPTURE_FILE else None
+
+    async def start(self):
+        """Open the UDP endpoint and connect to the X32 in the background"""
+        logger.info(f"Initializing X32 connection to {self._x32_address}:{X32_PORT}")
         
         try:
-            # Setup dispatcher und server
-            self._dispatcher = X32Dispatcher(self._input_queue)
+            # Socket selbst anlegen, damit Address-Reuse vor dem Binden gesetzt ist
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(("0.0.0.0", self._server_port))
             
-            # Create server
-            self._server = osc_server.ThreadingOSCUDPServer(
-                ("0.0.0.0", server_port), 
-                self._dispatcher
+            # Der gleiche Socket dient zum Empfangen und Senden
+            loop = asyncio.get_running_loop()
+            if self.capture is not None:
+                self.capture.start()
+                self._scheduler.every("capture", CAPTURE_FLUSH_INTERVAL, self.capture.flush)
+            self._transport, self._client = await loop.create_datagram_endpoint(
+                lambda: X32Protocol(self._dispatcher, (self._x32_address, X32_PORT), self.capture),
+                sock=sock
             )
-            logger.info(f"OSC server created on port {server_port}")
-            
-            # Get the socket from server und enable address reuse
-            self._server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            logger.info(f"OSC transport created on port {self._server_port}")
             
-            # Create client and use server's socket
-            self._client = udp_client.SimpleUDPClient(x32_address, X32_PORT)
-            self._client._sock = self._server.socket
-            logger.info("OSC client created using server socket")
+            # Start outbound task (gedrosseltes Senden von Änderungen)
+            self._outbound_task = asyncio.create_task(self._outbound.run())
             
-            # Start server thread
-            self._server_thread = Thread(target=self._server.serve_forever)
-            self._server_thread.daemon = True
-            self._server_thread.start()
-            logger.info("OSC server thread started")
+            # Start scheduler task (periodischer X32-Verkehr)
+            self._scheduler_task = asyncio.create_task(self._scheduler.run())
+            logger.info("Scheduler task started")
             
-            # Start meter polling thread
-            self._meter_thread = Thread(target=self._poll_meters)
-            self._meter_thread.daemon = True
-            self._meter_thread.start()
-            logger.info("Meter polling thread started")
-            
-            # Initialize connection
-            self._initialize_connection()
+            # Verbindungsaufbau läuft im Hintergrund, der Webserver ist sofort erreichbar
+            self._scheduler.call_later("reconnect", 0, self._reconnect)
             
         except Exception as e:
             logger.error(f"Error during initialization: {e}")
             raise
 
-    def _initialize_connection(self):
-        """Initialize connection to X32"""
-        max_retries = 5
-        retry_count = 0
+    async def stop(self):
+        """Stop the send and timer tasks, close the UDP endpoint and the capture log"""
+        for task in (self._scheduler_task, self._outbound_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._scheduler_task = self._outbound_task = None
+        self._connected = False
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        if self.capture is not None:
+            self.capture.close()
+
+    async def _initialize_connection(self):
+        """One connection attempt; returns True when the X32 answered /xinfo"""
+        logger.debug("Sending /xinfo request")
+        response = self._dispatcher.expect("/xinfo")
+        self._client.send_message("/xinfo", [","])  # Adding the "," type tag as seen in Wireshark
         
-        logger.info("Starting X32 connection initialization")
+        try:
+            args = await asyncio.wait_for(asyncio.shield(response), timeout=X32_CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("No response to /xinfo request")
+            return False
+        if len(args) != 4:
+            return False
         
-        while not self._connected and retry_count < max_retries:
-            try:
-                logger.debug(f"Connection attempt {retry_count + 1}")
-                
-                # Clear queue before sending info request
-                while True:
-                    try:
-                        self._input_queue.get_nowait()
-                    except queue.Empty:
-                        break
-                
-                # Send xinfo request with exact format
-                logger.debug("Sending /xinfo request")
-                self._client.send_message("/xinfo", [","])  # Adding the "," type tag as seen in Wireshark
-                
-                try:
-                    # Wait for response
-                    logger.debug("Waiting for /xinfo response")
-                    response = self._input_queue.get(timeout=self._timeout)
-                    if response and response.get("address") == "/xinfo":
-                        ip, name, model, fw = response["args"]
-                        logger.info(f"Connected to X32: {model} at {ip} (Name: {name}, Firmware: {fw})")
-                        self._connected = True
-                        
-                        # Subscribe to meter updates with exact format matching X32 Edit
-                        self._client.send_message("/xremote", [","])  # Adding type tag "," with null padding
-                        time.sleep(0.1)  # Give X32 time to process
-
-                        # Subscribe to fader updates
-                        logger.info("Subscribing to fader updates")
-                        
-                        # Subscribe to channel faders
-                        fader_paths = []
-                        for channel_num in CHANNEL_MAPPING.values():
-                            fader_paths.append(f"/ch/{channel_num:02d}/mix/fader")
-                        
-                        # Add master fader
-                        fader_paths.append("/main/st/mix/fader")
-                        
-                        # Create subscription message with type tags
-                        type_tags = ["s"] * len(fader_paths) + ["i", "i", "i"]
-                        type_tag_string = "," + "".join(type_tags)
-                        
-                        # Send subscription
-                        args = ["hidden/faders"] + fader_paths + [0, 0, 50]  # 50ms update interval
-                        self._client.send_message("/formatsubscribe", [type_tag_string] + args)
-                        
-                        # Also subscribe to general state updates as seen in Wireshark
-                        self._client.send_message("/formatsubscribe", 
-                            [",sssssssssssssssssssssiii", 
-                             "hidden/states",
-                             "/-stat/tape/state",
-                             "/-usb/path",
-                             "/-usb/title",
-                             "/-stat/tape/etime",
-                             "/-stat/tape/rtime",
-                             "/-stat/aes50/state",
-                             "/-stat/aes50/A",
-                             "/-stat/aes50/B",
-                             "/-show/prepos/current",
-                             "/-stat/usbmounted",
-                             "/-usb/dir/dirpos",
-                             "/-usb/dir/maxpos",
-                             "/-stat/xcardtype",
-                             "/-stat/xcardsync",
-                             "/-stat/rtasource",
-                             "/-stat/talk/A",
-                             "/-stat/talk/B",
-                             "/-stat/osc/on",
-                             "/-stat/keysolo",
-                             "/-stat/urec/state",
-                             "/-stat/urec/etime",
-                             "/-stat/urec/rtime",
-                             0, 0, 4])
-                        
-                        return
-                except queue.Empty:
-                    logger.warning("No response to /xinfo request")
-                
-            except Exception as e:
-                logger.error(f"Connection attempt {retry_count + 1} failed: {e}")
-            
-            retry_count += 1
-            if retry_count < max_retries:
-                logger.info(f"Retrying in 1 second... (attempt {retry_count + 1}/{max_retries})")
-                time.sleep(1)
+        ip, name, model, fw = args
+        logger.info(f"Connected to X32: {model} at {ip} (Name: {name}, Firmware: {fw})")
+        self._connected = True
+        self._reconnect_delay = X32_RECONNECT_DELAY
+        self._on_connected()
+        publish_connection_state("connected", name=name, model=model, firmware=fw)
+        return True
+
+    def _on_connected(self):
+        """Set up remote updates and all periodic jobs for a fresh connection"""
+        # Subscribe to updates with exact format matching X32 Edit
+        self._keepalive()
+        self._scheduler.every("keepalive", X32_KEEPALIVE_INTERVAL, self._keepalive,
+                              delay=X32_KEEPALIVE_INTERVAL)
         
-        if not self._connected:
-            logger.error(f"Failed to connect to X32 at {self._x32_address}:{X32_PORT}")
-            raise ConnectionError(f"Could not connect to X32 at {self._x32_address}:{X32_PORT}")
+        for block in CONSOLE_BLOCKS:
+            block.reset()
+        if self._subscriptions_active:
+            self._subscribe()
+        
+        if self._meters_active:
+            self._scheduler.every("meters", METER_RENEW_INTERVAL, self._request_meters)
+        
+        # Zustandsspiegel einmalig pro Verbindung füllen
+        self.request_initial_values()
 
-    def _poll_meters(self):
-        """Poll meter values regularly"""
-        while True:
-            if self._connected:
-                try:
-                    # Request meter values for Main LR
-                    self._client.send_message("/meters", ["/meters/2"])
-                except Exception as e:
-                    logger.error(f"Error polling meters: {e}")
-            time.sleep(0.05)  # 50ms update rate
+    def _keepalive(self):
+        # UDP meldet keinen Verbindungsabbruch: schweigt das X32 zu lange, gilt es als getrennt
+        if self._dispatcher.last_received < time.monotonic() - X32_CONNECTION_TIMEOUT:
+            logger.error("No data from X32 for %.0f seconds", X32_CONNECTION_TIMEOUT)
+            self._on_connection_lost()
+            return
+        try:
+            self._client.send_message("/xremote", None)
+            # Antwort auf /xinfo hält die Verbindung auch ohne Änderungen am Pult lebendig
+            self._client.send_message("/xinfo", [","])
+        except Exception:
+            logger.error("Error sending /xremote")
+            self._on_connection_lost()
+
+    def _on_connection_lost(self):
+        self._connected = False
+        self.fades.cancel_all()
+        for name in ["keepalive", "meters", "initial-read"]:
+            self._scheduler.cancel(name)
+        self._cancel_renewals()
+        publish_connection_state("connecting")
+        self._scheduler.call_later("reconnect", self._reconnect_delay, self._reconnect)
+
+    async def _reconnect(self):
+        """Connection attempt from the timer; retries with exponential backoff"""
+        metrics.reconnects.inc()
+        try:
+            if await self._initialize_connection():
+                return
+        except Exception as e:
+            logger.error(f"Connection attempt failed: {e}")
+        delay = self._reconnect_delay
+        self._reconnect_delay = min(delay * 2, X32_RECONNECT_MAX_DELAY)
+        logger.info("Retrying connection to X32 in %.1f seconds", delay)
+        self._scheduler.call_later("reconnect", delay, self._reconnect)
+
+    def _subscribe(self):
+        logger.info("Subscribing to console updates")
+        for alias, (paths, start, end, time_factor) in SUBSCRIPTIONS.items():
+            self._client.send_message("/formatsubscribe", [alias] + paths + [start, end, time_factor])
+            self._scheduler.every(f"renew:{alias}", SUBSCRIPTION_RENEW_INTERVAL,
+                                  lambda alias=alias: self._client.send_message("/renew", [alias]),
+                                  delay=SUBSCRIPTION_RENEW_INTERVAL)
+
+    def _cancel_renewals(self):
+        for alias in SUBSCRIPTIONS:
+            self._scheduler.cancel(f"renew:{alias}")
+
+    def set_subscriptions_active(self, active):
+        """Start or stop the /formatsubscribe polling depending on whether any client
+        is connected; without renewals the X32 ends the subscriptions after 10 seconds
+        """
+        if active == self._subscriptions_active:
+            return
+        self._subscriptions_active = active
+        if not active:
+            self._cancel_renewals()
+        elif self._connected:
+            self._subscribe()
+
+    def _wanted_meter_banks(self):
+        banks = list(METER_BANKS)
+        if ducking.active and DUCKING_METER_BANK not in banks:
+            banks.append(DUCKING_METER_BANK)
+        return banks
 
-    def get_value(self, path):
+    def _request_meters(self):
+        """Request meter values for all configured banks (the X32 sends them for 10 seconds)"""
+        self._meter_banks = banks = self._wanted_meter_banks()
+        try:
+            for bank in banks:
+                self._client.send_message("/meters", [bank])
+        except Exception as e:
+            logger.error(f"Error polling meters: {e}")
+
+    def set_meters_active(self, active):
+        """Start or stop meter updates depending on whether anyone is watching;
+        banks that became necessary (e.g. for ducking) are requested right away
+        """
+        if active == self._meters_active and (not active or self._wanted_meter_banks() == self._meter_banks):
+            return
+        self._meters_active = active
+        if not active:
+            self._scheduler.cancel("meters")
+        elif self._connected:
+            self._scheduler.every("meters", METER_RENEW_INTERVAL, self._request_meters)
+
+    async def get_value(self, path):
         """Get value from X32"""
+        values = await self.get_many([path])
+        return values[path]
+
+    async def get_many(self, paths, refresh=False):
+        """Read several values from X32 in one round trip
+        All queries are sent at once; replies are matched by OSC address.
+        Returns {path: value}, with None for paths that did not answer in time.
+        """
         if not self._connected:
             logger.error("Not connected to X32")
-            return None
-            
-        # Try to get value from dispatcher cache first
-        value = self._dispatcher.get_value(path)
-        if value is not None:
-            return value
+            return {path: None for path in paths}
             
-        # If not in cache, request it
-        logger.debug(f"Requesting value for {path}")
-        self._client.send_message(path, [","])
+        # Try to get values from dispatcher cache first
+        results = {}
+        waiters = {}
+        for path in paths:
+            value = None if refresh else self._dispatcher.get_value(path)
+            if value is not None:
+                results[path] = value
+            elif path not in waiters:
+                waiters[path] = self._dispatcher.expect(path)
         
-        try:
-            response = self._input_queue.get(timeout=self._timeout)
-            if response.get("args"):
-                logger.debug(f"Received value for {path}: {response['args'][0]}")
-                return response["args"][0]  # Return first value
-            logger.warning(f"Empty response for {path}")
-            return None
-        except queue.Empty:
-            logger.error(f"Timeout getting value for {path}")
-            return None
+        # If not in cache, request all of them without waiting in between
+        for path in waiters:
+            logger.debug("Requesting value for %s", path)
+            self._client.send_message(path, None)
+        
+        if waiters:
+            await asyncio.wait(waiters.values(), timeout=self._timeout)
+        
+        for path, waiter in waiters.items():
+            if waiter.done() and waiter.result():
+                results[path] = waiter.result()[0]  # Return first value
+            else:
+                logger.error(f"Timeout getting value for {path}")
+                results[path] = None
+        return results
+
+    def _send_packet(self, dgram):
+        self._client.send_packet(dgram)
 
     def set_value(self, path, value):
         """Set value on X32"""
@@ -409,173 +660,628 @@ class X32Connection:
             logger.error("Not connected to X32")
             return
             
-        logger.debug(f"Setting {path} to {value}")
-        self._client.send_message(path, value)
-
-    def maintain_connection(self):
-        """Maintain connection to X32"""
-        while True:
-            if self._connected:
-                try:
-                    self._client.send_message("/xremote", None)
-                    time.sleep(9)
-                except:
-                    logger.error("Error sending /xremote")
-                    self._connected = False
-            else:
-                try:
-                    logger.info("Connection lost, attempting to reconnect...")
-                    self._initialize_connection()
-                except:
-                    logger.error("Failed to reconnect to X32")
-                time.sleep(1)
+        logger.debug("Setting %s to %s", path, value)
+        # Ein Wert von Hand beendet einen laufenden Fade auf diesem Fader
+        self.fades.cancel(path)
+        # Nur der neueste Wert pro Pfad wird gesendet, gebündelt pro Takt
+        self._outbound.submit(path, value)
+        # Eigene Änderungen sofort im Zustandsspiegel und bei den anderen Clients
+        self._dispatcher.record(path, value)
 
-    def request_initial_values(self):
-        """Request current values for all channels"""
-        logger.info("Requesting initial channel values")
-        
-        # Request main fader
-        self._client.send_message("/main/st/mix/fader", None)
-        
-        # Request channel faders
-        for channel_num in CHANNEL_MAPPING.values():
-            path = f"/ch/{channel_num:02d}/mix/fader"
-            self._client.send_message(path, None)
-            
-        # Small delay to allow responses to arrive
-        time.sleep(0.1)
+    def submit_values(self, changes):
+        """Queue several (path, value) pairs for the next send tick in one step"""
+        if not self._connected:
+            logger.error("Not connected to X32")
+            return False
         
-        # Send current values from cache
-        for channel_name, channel_num in CHANNEL_MAPPING.items():
-            path = f"/ch/{channel_num:02d}/mix/fader"
-            value = self._dispatcher.get_value(path)
-            if value is not None:
-                message = {
-                    "type": "fader",
-                    "channel": channel_name,
-                    "value": value
-                }
-                logger.debug(f"Putting initial fader message in queue: {json.dumps(message)}")
-                update_queue.put(json.dumps(message))
+        for path, _ in changes:
+            self.fades.cancel(path)
+        self._outbound.submit_many(changes)
+        for path, value in changes:
+            self._dispatcher.record(path, value)
+        return True
+
+    def set_values(self, changes):
+        """Set several (path, value) pairs at once as one time-tagged OSC bundle"""
+        if not self._connected:
+            logger.error("Not connected to X32")
+            return False
         
-        # Send master fader value
-        master_value = self._dispatcher.get_value("/main/st/mix/fader")
-        if master_value is not None:
-            message = {
-                "type": "fader",
-                "channel": "master",
-                "value": master_value
-            }
-            logger.debug(f"Putting initial master fader message in queue: {json.dumps(message)}")
-            update_queue.put(json.dumps(message))
-
-# Globale X32-Verbindung initialisieren
+        for path, _ in changes:
+            self.fades.cancel(path)
+        self._outbound.send_now(changes, time.time())
+        # Alle Änderungen landen im selben Broadcast-Takt, also in einem Frame
+        for path, value in changes:
+            self._dispatcher.record(path, value)
+        return True
+
+    def fade(self, path, target, duration, curve="linear"):
+        """Fade a fader from its mirrored value to target over duration seconds"""
+        if not self._connected:
+            logger.error("Not connected to X32")
+            return False
+        start_value = self._dispatcher.get_value(path)
+        if start_value is None:
+            raise ValueError(f"Current value of {path} is not known yet")
+        self.fades.start(path, float(start_value), float(target), float(duration), curve)
+        return True
+
+    def _on_console_fader(self, path, value):
+        # Jemand bewegt den Fader am Pult: Fade beenden, noch nicht gesendeten Wert verwerfen
+        if self.fades.fader_moved(path, value):
+            self._outbound.discard(path)
+            # Ein schon unterwegs befindlicher Fade-Wert kann die Bewegung noch überholen;
+            # nach dem Echo-Fenster den tatsächlichen Stand neu lesen
+            self._scheduler.call_later(f"fade-check {path}", X32_ECHO_WINDOW,
+                                       lambda: self.get_many([path], refresh=True))
+
+    def _apply_fade_step(self, changes):
+        # Zwischenwerte aller Fades eines Takts gehen gemeinsam in den nächsten Sende-Takt
+        self._outbound.submit_many(changes)
+        for path, value in changes:
+            self._dispatcher.record(path, value)
+
+    def request_initial_values(self):
+        """Query the whole console once per connection; replies update the mirror
+        Queries go out X32_READ_BATCH at a time as one bundle per X32_READ_INTERVAL,
+        so the console's input buffer is never flooded.
+        """
+        logger.info("Requesting initial values of %d parameters", len(CONSOLE_PATHS))
+        paths = list(CONSOLE_PATHS)
+        batches = iter([paths[i:i + X32_READ_BATCH] for i in range(0, len(paths), X32_READ_BATCH)])
+
+        def send_batch():
+            batch = next(batches, None)
+            if batch is None:
+                self._scheduler.cancel("initial-read")
+                return
+            self._client.send_packet(build_bundle([(path, None) for path in batch]))
+            if metrics.enabled:
+                for path in batch:
+                    metrics.osc_packets.inc("out", metrics.osc_family(path))
+
+        self._scheduler.every("initial-read", X32_READ_INTERVAL, send_batch)
+
+    @property
+    def connected(self):
+        """True while the X32 answers"""
+        return self._connected
+
+    def cached_value(self, path):
+        """Mirrored value of a path without asking the X32 (None until known)"""
+        return self._dispatcher.get_value(path)
+
+    def console_values(self):
+        """Mirrored values of every console parameter (None until known)"""
+        return {path: self._dispatcher.get_value(path) for path in CONSOLE_PATHS}
+
+# Globale X32-Verbindung anlegen (der Transport wird beim Startup geöffnet)
 logger.info(f"Creating X32 connection to {X32_IP}:{X32_PORT}")
 x32 = X32Connection(X32_IP, LOCAL_PORT)
 
-# Start connection maintenance thread
-logger.info("Starting connection maintenance thread")
-connection_thread = Thread(target=x32.maintain_connection)
-connection_thread.daemon = True
-connection_thread.start()
+# Ducking-Regeln aus config.py; setzen den Ziel-Fader wie ein Client über x32.set_value
+ducking = DuckingEngine(build_ducking_rules(DUCKING_RULES, COMMAND_PATHS, CHANNEL_MAPPING),
+                        x32.set_value, x32.cached_value)
 
 @app.get("/")
-async def read_root():
-    return FileResponse("static/index.html")
+async def read_root(request: Request):
+    return asset_response(static_files["/static/index.html"], request)
+
+@app.get("/sw.js")
+async def service_worker(request: Request):
+    # Unter / ausgeliefert, damit der Service Worker die ganze Seite abdeckt
+    return asset_response(static_files["/static/sw.js"], request)
+
+@app.get("/static/{path:path}")
+async def static_file(path: str, request: Request, v: str = None):
+    asset = static_files.get("/static/" + path)
+    if asset is None:
+        return JSONResponse(content={"status": "error", "message": "Not found"}, status_code=404)
+    # Nur Adressen mit dem aktuellen Hash dürfen dauerhaft gecacht werden
+    return asset_response(asset, request, immutable=v == asset.hash)
+
+# Zustandswerte, die erst beim Abruf von /metrics gelesen werden
+metrics.Gauge("x32_connected", "1 if the X32 answered /xinfo", lambda: int(x32.connected))
+# Werte pro Client werden bei WORKERS > 1 aus den Workern zusammengefasst
+metrics.Gauge("x32_websocket_clients", "Connected WebSocket clients", lambda: len(connected_clients), merge=sum)
+metrics.Gauge("x32_client_queue_depth_max", "Largest client send buffer",
+              lambda: max((client.queue_depth for client in connected_clients), default=0),
+              merge=lambda values: max(values, default=0))
+metrics.Gauge("x32_client_queue_depth_total", "Messages waiting in all client send buffers",
+              lambda: sum(client.queue_depth for client in connected_clients), merge=sum)
+metrics.Gauge("x32_conflator_pending", "Updates waiting for the next broadcast tick",
+              lambda: conflator.pending)
+
+# Endpunkte, die Zustand des Ingest-Prozesses brauchen (Meter-Verlauf, Audio, Messwerte)
+INGEST_ENDPOINTS = {}
+
+def ingest_endpoint(endpoint):
+    """Run the endpoint in the ingest process when this process is a worker"""
+    INGEST_ENDPOINTS[endpoint.__name__] = endpoint
+
+    @functools.wraps(endpoint)
+    async def forward(**kwargs):
+        if WORKERS == 1 or ingest_process:
+            return await endpoint(**kwargs)
+        try:
+            reply = await ingest_link.call(endpoint.__name__, kwargs)
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            return JSONResponse(content={"status": "error", "message": str(e)}, status_code=503)
+        return Response(content=reply["body"], status_code=reply["status"], media_type=reply["media_type"])
+    return forward
+
+# Ausstehende Messwert-Anfragen des Ingest-Prozesses an die Worker: ID -> Future
+metrics_requests = {}
+metrics_request_ids = itertools.count()
+
+async def collect_worker_metrics(timeout=1.0):
+    """Metrics snapshots of all worker processes; workers that do not answer in time are left out"""
+    loop = asyncio.get_running_loop()
+    requests = {}
+    # Im Ingest-Prozess sind alle verbundenen "Clients" Worker
+    for worker in list(connected_clients):
+        request_id = next(metrics_request_ids)
+        requests[request_id] = metrics_requests[request_id] = loop.create_future()
+        worker.send(json.dumps({"type": "metrics_request", "id": request_id}))
+    try:
+        if requests:
+            await asyncio.wait(requests.values(), timeout=timeout)
+    finally:
+        for request_id in requests:
+            metrics_requests.pop(request_id, None)
+    return [future.result() for future in requests.values() if future.done()]
+
+@app.get("/metrics")
+@ingest_endpoint
+async def read_metrics():
+    # Der erste Abruf schaltet die Messung ein (bei mehreren Prozessen auch in den Workern)
+    remote = await collect_worker_metrics() if ingest_process else None
+    return PlainTextResponse(metrics.render(remote), media_type="text/plain; version=0.0.4")
+
+@app.get("/console")
+@ingest_endpoint
+async def read_console():
+    """Mirror of the whole console: {OSC path: value}"""
+    return JSONResponse(content={"connected": x32.connected, "values": x32.console_values()})
+
+def select_meters(history, bank, meters):
+    """Meter indices from a comma separated query value; default Main LR"""
+    if meters:
+        indices = [int(index) for index in meters.split(",")]
+    elif bank == MAIN_LR_BANK:
+        indices = list(MAIN_LR_INDEX)
+    else:
+        indices = list(range(history.count))
+    if any(index < 0 or index >= history.count for index in indices):
+        raise ValueError(f"Meter index out of range (0-{history.count - 1})")
+    return indices
+
+def missing_history(bank):
+    if METER_HISTORY_SECONDS <= 0:
+        message = "Meter history is disabled (METER_HISTORY_SECONDS in config.py)"
+    else:
+        message = f"No history for {bank}"
+    return JSONResponse(content={"status": "error", "message": message}, status_code=404)
+
+@app.get("/meters/history")
+@ingest_endpoint
+async def read_meter_history(bank: str = MAIN_LR_BANK, points: int = 300,
+                             seconds: float = METER_HISTORY_SECONDS, meters: str = ""):
+    """Meter history as min/max per time bucket, e.g. for a loudness graph"""
+    history = meter_history.get(bank)
+    if history is None:
+        return missing_history(bank)
+    try:
+        indices = select_meters(history, bank, meters)
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    points = max(1, min(points, 2000))
+    end = time.time()
+    start = end - max(0.0, min(seconds, METER_HISTORY_SECONDS))
+    result = history.downsample(indices, points, start, end)
+    return JSONResponse(content={"bank": bank, "meters": indices, "start": start, "end": end, **result})
+
+@app.get("/meters/stats")
+@ingest_endpoint
+async def read_meter_stats(bank: str = MAIN_LR_BANK, meters: str = ""):
+    """Peak-hold, peak and clip counts since the last reset, RMS over the history"""
+    history = meter_history.get(bank)
+    if history is None:
+        return missing_history(bank)
+    try:
+        indices = select_meters(history, bank, meters)
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    return JSONResponse(content={"bank": bank, "meters": indices, **history.stats(indices)})
+
+@app.post("/meters/stats/reset")
+@ingest_endpoint
+async def reset_meter_stats():
+    for history in meter_history.values():
+        history.reset_stats()
+    return JSONResponse(content={"status": "success"})
+
+def trigger_cue(name, policy):
+    """Hand a cue to the cue thread and answer immediately"""
+    if cue_engine.error:
+        return JSONResponse(content={"status": "error", "message": cue_engine.error}, status_code=503)
+    try:
+        cue_engine.play(name, policy)
+    except KeyError:
+        logger.error(f"Cue not found: {name}")
+        return JSONResponse(content={"status": "error", "message": f"Cue {name} not found"}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    return JSONResponse(content={"status": "success"})
 
 @app.post("/play-gong")
+@ingest_endpoint
 async def play_gong():
+    return trigger_cue("gong", CUE_POLICY)
+
+@app.get("/cues")
+@ingest_endpoint
+async def list_cues():
+    return JSONResponse(content={"cues": cue_engine.cues()})
+
+@app.post("/cues/stop")
+@ingest_endpoint
+async def stop_cues():
+    cue_engine.stop()
+    return JSONResponse(content={"status": "success"})
+
+@app.post("/cues/{name}/play")
+@ingest_endpoint
+async def play_cue(name: str, policy: str = CUE_POLICY):
+    return trigger_cue(name, policy)
+
+@app.post("/cues/{name}/stop")
+@ingest_endpoint
+async def stop_cue(name: str):
+    if not cue_engine.has_cue(name):
+        return JSONResponse(content={"status": "error", "message": f"Cue {name} not found"}, status_code=404)
+    cue_engine.stop(name)
+    return JSONResponse(content={"status": "success"})
+
+def recall_preset(name):
+    """Send a stored preset to the X32 as a single bundle; KeyError if unknown"""
+    preset = preset_store.get(name)
+    if preset is None:
+        raise KeyError(name)
+    changes = [(COMMAND_PATHS[("fader", channel)], value) for channel, value in preset["faders"].items()]
+    changes += [(COMMAND_PATHS[("mute", channel)], value) for channel, value in preset["mutes"].items()]
+    return x32.set_values(changes)
+
+@app.get("/presets")
+@ingest_endpoint
+async def list_presets():
+    return JSONResponse(content={"presets": preset_store.all()})
+
+@app.put("/presets/{name}")
+@ingest_endpoint
+async def save_preset(name: str, preset: dict = Body(...)):
     try:
-        import os
-        import pygame
-        
-        gong_path = os.path.join(os.path.dirname(__file__), 'audio', 'gong.mp3')
-        logging.info(f"Attempting to play gong from: {gong_path}")
-        
-        if not os.path.exists(gong_path):
-            logging.error(f"Gong file not found at: {gong_path}")
-            return JSONResponse(
-                content={"status": "error", "message": "Gong file not found"},
-                status_code=404
-            )
-        
-        # Initialize pygame mixer
-        pygame.mixer.init()
-        pygame.mixer.music.load(gong_path)
-        pygame.mixer.music.play()
-        
-        return JSONResponse(content={"status": "success"})
+        preset = preset_store.set(name, preset)
+        preset_store.save_file()
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    return JSONResponse(content={"status": "success", "preset": preset})
+
+@app.post("/presets/{name}/capture")
+@ingest_endpoint
+async def capture_preset(name: str):
+    """Store the current mirrored state under name"""
+    try:
+        preset = preset_store.set(name, preset_store.capture(mixer_state))
+        preset_store.save_file()
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=409)
+    return JSONResponse(content={"status": "success", "preset": preset})
+
+@app.post("/presets/{name}/recall")
+@ingest_endpoint
+async def recall_preset_endpoint(name: str):
+    try:
+        sent = recall_preset(name)
+    except KeyError:
+        return JSONResponse(content={"status": "error", "message": f"Preset {name} not found"}, status_code=404)
+    if not sent:
+        return JSONResponse(content={"status": "error", "message": "Not connected to X32"}, status_code=503)
+    return JSONResponse(content={"status": "success"})
+
+@app.delete("/presets/{name}")
+@ingest_endpoint
+async def delete_preset(name: str):
+    if not preset_store.delete(name):
+        return JSONResponse(content={"status": "error", "message": f"Preset {name} not found"}, status_code=404)
+    preset_store.save_file()
+    return JSONResponse(content={"status": "success"})
+
+def start_fade(channel, value, duration, curve="linear"):
+    """Fade a mapped fader on the server; KeyError for unknown channels, ValueError for bad values"""
+    return x32.fade(COMMAND_PATHS[("fader", channel)], value, duration, curve)
+
+@app.get("/fades")
+@ingest_endpoint
+async def list_fades():
+    paths = {path: channel for (kind, channel), path in COMMAND_PATHS.items() if kind == "fader"}
+    fades = {paths.get(path, path): {"target": target, "remaining": round(remaining, 3)}
+             for path, (target, remaining) in x32.fades.active().items()}
+    return JSONResponse(content={"fades": fades})
+
+@app.post("/fades")
+@ingest_endpoint
+async def fade_endpoint(channel: str = Body(...), value: float = Body(...),
+                        duration: float = Body(...), curve: str = Body("linear")):
+    try:
+        sent = start_fade(channel, value, duration, curve)
+    except KeyError:
+        return JSONResponse(content={"status": "error", "message": f"Unknown channel: {channel}"}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    if not sent:
+        return JSONResponse(content={"status": "error", "message": "Not connected to X32"}, status_code=503)
+    return JSONResponse(content={"status": "success"})
+
+@app.delete("/fades/{channel}")
+@ingest_endpoint
+async def cancel_fade(channel: str):
+    path = COMMAND_PATHS.get(("fader", channel))
+    if path is None or not x32.fades.cancel(path):
+        return JSONResponse(content={"status": "error", "message": f"No fade running on {channel}"}, status_code=404)
+    return JSONResponse(content={"status": "success"})
+
+@app.get("/ducking")
+@ingest_endpoint
+async def list_ducking():
+    return JSONResponse(content={"rules": [rule.status() for rule in ducking.rules]})
+
+@app.post("/ducking/{target}")
+@ingest_endpoint
+async def set_ducking(target: str, enabled: bool = Body(..., embed=True)):
+    """Switch the ducking rule of a target fader on or off"""
+    rule = ducking.get(target)
+    if rule is None:
+        return JSONResponse(content={"status": "error", "message": f"No ducking rule for {target}"}, status_code=404)
+    ducking.set_enabled(rule, enabled)
+    update_subscriptions()
+    return JSONResponse(content={"status": "success", "rule": rule.status()})
+
+# Geprüfte Befehle der Clients, ausgeführt im Ingest-Prozess (oder im einzigen Prozess)
+def apply_commands(commands):
+    """Apply validated commands in order; returns error replies for those that failed.
+    Consecutive fader/mute values go to the X32 sender together in one step.
+    """
+    errors = []
+    changes = []
+    for command in commands:
+        if command["type"] in ("fader", "mute"):
+            changes.append((command["path"], command["value"]))
+            continue
+        # Reihenfolge einhalten: vorher gesammelte Werte zuerst abgeben
+        if changes and not x32.submit_values(changes):
+            errors.append(command_error("not_connected", "Not connected to X32"))
+        changes = []
+        try:
+            if command["type"] == "recall_preset":
+                sent = recall_preset(command["name"])
+            else:
+                sent = x32.fade(command["path"], command["value"], command["duration"], command["curve"])
+        except KeyError:
+            errors.append(command_error("unknown_preset", f"Preset {command['name']} not found", command))
+            continue
+        except ValueError as e:
+            errors.append(command_error("invalid_value", str(e), command))
+            continue
+        if not sent:
+            errors.append(command_error("not_connected", "Not connected to X32", command))
+    if changes and not x32.submit_values(changes):
+        errors.append(command_error("not_connected", "Not connected to X32"))
+    return errors
+
+def handle_commands(frame):
+    """Validate and apply a command frame from a client or a worker process"""
+    commands, errors = command_schema.parse(frame)
+    if commands:
+        errors += apply_commands(commands)
+    return errors
+
+# Worker-Seite: Updates aus dem Ingest-Prozess spiegeln und an die eigenen Clients verteilen
+def on_ingest_text(text):
+    message = json.loads(text)
+    if message["type"] == "metrics_request":
+        # Der Ingest-Prozess sammelt für /metrics die Werte aller Worker
+        ingest_link.send({"type": "metrics", "id": message["id"], "values": metrics.snapshot()})
+        return
+    mixer_state.apply(message)
+    messages = message["messages"] if message["type"] == "batch" else [message]
+    if message["type"] == "snapshot":
+        # Neuer Stand nach Wiederverbindung mit dem Ingest-Prozess: jeder Client bekommt seinen Ausschnitt
+        for client in list(connected_clients):
+            client.send(json.dumps(client_snapshot(client)))
+        return
+    broadcast_updates(messages, frame=text)
+
+def on_ingest_meters(frame):
+    bank, meters_db = decode_meter_frame(frame)
+    message = None
+    if bank == MAIN_LR_BANK and len(meters_db) > max(MAIN_LR_INDEX):
+        message = main_lr_message(meters_db)
+        mixer_state.update_meters(message["left"], message["right"])
+    broadcast_meters(bank, meters_db, message, binary_frame=frame)
+
+def on_ingest_lost():
+    # Ohne Ingest-Prozess gibt es für die Clients dieses Workers keine Verbindung zum X32
+    broadcast_updates([mixer_state.set_connection("connecting", None)])
+
+ingest_link = IngestLink(on_ingest_text, on_ingest_meters, on_ingest_lost)
+
+# Ingest-Seite: ein verbundener Worker wird wie ein Client behandelt, der alle
+# Updates und Meter als binäre Frames bekommt
+async def handle_worker(reader, writer):
+    worker_socket = WorkerSocket(writer)
+    # Sendeverzögerung und Latenz misst jeder Worker für seine Browser selbst
+    worker = ClientConnection(worker_socket, max_queue=WORKER_QUEUE_SIZE, measure=False)
+    worker.binary_meters = True
+    worker.wants_meters = False
+    worker.wants_console = False
+    worker.start()
+    connected_clients.append(worker)
+    logger.info("Worker process connected")
+    try:
+        # Zustand zuerst, danach laufende Updates über denselben Puffer
+        worker.send(json.dumps(mixer_state.snapshot()))
+        while True:
+            _, payload = await read_frame(reader)
+            message = json.loads(payload)
+            if message["type"] == "call":
+                asyncio.create_task(answer_worker_call(worker_socket, message))
+            elif message["type"] == "metrics":
+                future = metrics_requests.get(message["id"])
+                if future is not None and not future.done():
+                    future.set_result(message["values"])
+            elif message["type"] == "meters_view":
+                worker.wants_meters = bool(message["active"])
+                update_subscriptions()
+            elif message["type"] == "console_view":
+                worker.wants_console = bool(message["active"])
+                update_subscriptions()
+            elif message["type"] == "batch" or message["type"] in COMMAND_TYPES:
+                # Schon im Worker geprüft; Fehler hier (z.B. unbekanntes Preset) gehen an ihn zurück
+                errors = handle_commands(message)
+                if "id" in message:
+                    worker_socket.reply({"id": message["id"], "errors": errors})
+    except (asyncio.IncompleteReadError, ConnectionError):
+        logger.info("Worker process disconnected")
+    except Exception as e:
+        logger.error(f"Error in worker connection: {e}")
+    finally:
+        await worker.close()
+        if worker in connected_clients:
+            connected_clients.remove(worker)
+        update_subscriptions()
+        writer.close()
+
+async def answer_worker_call(worker_socket, message):
+    endpoint = INGEST_ENDPOINTS.get(message["endpoint"])
+    try:
+        if endpoint is None:
+            raise KeyError(message["endpoint"])
+        response = await endpoint(**message["kwargs"])
+        body, status, media_type = response.body.decode(), response.status_code, response.media_type
     except Exception as e:
-        logging.error(f"Error playing gong: {str(e)}")
-        return JSONResponse(
-            content={"status": "error", "message": str(e)},
-            status_code=500
-        )
+        logger.error(f"Error in endpoint {message['endpoint']} for worker: {e}")
+        body, status, media_type = json.dumps({"status": "error", "message": str(e)}), 500, "application/json"
+    worker_socket.reply({"id": message["id"], "status": status, "media_type": media_type, "body": body})
+
+def client_snapshot(client):
+    snapshot = mixer_state.snapshot()
+    return snapshot if client.topics is None else client.topics.filter_snapshot(snapshot)
+
+def subscribe_client(client, topics):
+    """Replace the client's topic subscription; None subscribes to everything again"""
+    try:
+        topic_filter = TopicFilter(topics, client.send) if topics is not None else None
+    except ValueError as e:
+        client.send(json.dumps(command_error("invalid_topics", str(e))))
+        return
+    if client.topics is not None:
+        client.topics.close()
+    client.topics = topic_filter
+    client.send(json.dumps(client_snapshot(client)))
+
+def forward_command_errors(client, indices, reply):
+    """Pass errors from the ingest process on to the client that sent the commands"""
+    if reply.cancelled():
+        return
+    if reply.exception() is not None:
+        errors = [command_error("not_connected", str(reply.exception()))]
+    else:
+        errors = reply.result()["errors"]
+        for error in errors:
+            # Position im weitergegebenen Batch -> Position im Frame des Clients
+            if "index" in error:
+                if indices[error["index"]] is None:
+                    del error["index"]
+                else:
+                    error["index"] = indices[error["index"]]
+    if errors:
+        client.send(encode_updates(errors))
+
+def handle_client_frame(client, data):
+    """Handle one text frame from a WebSocket client; problems are answered, never fatal"""
+    try:
+        message = json.loads(data)
+    except json.JSONDecodeError as e:
+        client.send(json.dumps(command_error("invalid_json", f"Invalid JSON: {e}")))
+        return
+    
+    kind = message.get("type") if isinstance(message, dict) else None
+    if kind == "request_initial_values":
+        client.send(json.dumps(client_snapshot(client)))
+    elif kind == "subscribe":
+        # Themen und Raten wählen; danach gilt ein passender Snapshot
+        subscribe_client(client, message.get("topics"))
+        update_subscriptions()
+    elif kind == "meter_format":
+        # Client wählt JSON (Standard) oder binäre Meter-Frames
+        client.binary_meters = message.get("format") == "binary"
+    elif kind == "meters_view":
+        # Client meldet, ob Meter gerade sichtbar sind (z.B. Tab im Hintergrund)
+        client.wants_meters = bool(message.get("active"))
+        update_subscriptions()
+    else:
+        # Einzelner Befehl oder Batch: prüfen und als Ganzes weitergeben
+        commands, errors = command_schema.parse(message)
+        if commands:
+            if WORKERS > 1:
+                try:
+                    reply = ingest_link.request({"type": "batch", "messages": commands})
+                except ConnectionError as e:
+                    errors.append(command_error("not_connected", str(e)))
+                else:
+                    indices = [command.get("index") for command in commands]
+                    reply.add_done_callback(functools.partial(forward_command_errors, client, indices))
+            else:
+                errors += apply_commands(commands)
+        if errors:
+            client.send(encode_updates(errors))
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("WebSocket client connected")
-    connected_clients.append(websocket)
+    client = ClientConnection(websocket)
+    client.start()
+    connected_clients.append(client)
+    update_subscriptions()
     logger.info(f"Number of connected clients: {len(connected_clients)}")
     
     try:
-        # Request initial values when client connects
-        x32.request_initial_values()
+        # Neuer Client bekommt den kompletten Zustand aus dem Speicher in einem Frame
+        client.send(json.dumps(client_snapshot(client)))
         
         while True:
+            # Ohne Timeout warten: ein ruhiger Client kostet keinen Timer
+            data = await websocket.receive_text()
             try:
-                # Setze ein Timeout für receive_text
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=1.0)
-                message = json.loads(data)
-                
-                if message["type"] == "request_initial_values":
-                    x32.request_initial_values()
-                elif message["type"] == "fader":
-                    channel = message["channel"]
-                    value = message["value"]
-                    
-                    if channel == "master":
-                        path = "/main/st/mix/fader"
-                    else:
-                        channel_num = CHANNEL_MAPPING[channel]
-                        path = f"/ch/{channel_num:02d}/mix/fader"
-                    
-                    x32.set_value(path, float(value))
-                    
-                elif message["type"] == "mute":
-                    channel = message["channel"]
-                    value = message["value"]
-                    
-                    if channel == "master":
-                        path = "/main/st/mix/on"
-                    else:
-                        channel_num = CHANNEL_MAPPING[channel]
-                        path = f"/ch/{channel_num:02d}/mix/on"
-                    
-                    x32.set_value(path, 1 if value else 0)
-                    
-            except asyncio.TimeoutError:
-                # Timeout ist normal, weiter warten
-                continue
-            except WebSocketDisconnect:
-                logger.info("WebSocket client disconnected normally")
-                break
-            except json.JSONDecodeError:
-                logger.warning("Invalid JSON received")
-                continue
+                handle_client_frame(client, data)
             except Exception as e:
                 logger.error(f"Error processing WebSocket message: {e}")
-                break
-                
+                client.send(json.dumps(command_error("internal_error", str(e))))
+
     except WebSocketDisconnect:
         logger.info("WebSocket client disconnected normally")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
-        if websocket in connected_clients:
-            connected_clients.remove(websocket)
+        await client.close()
+        if client.topics is not None:
+            client.topics.close()
+        if client in connected_clients:
+            connected_clients.remove(client)
             logger.info("WebSocket client removed from connected clients")
+        update_subscriptions()
 
 if __name__ == "__main__":
     import uvicorn
@@ -584,4 +1290,13 @@ if __name__ == "__main__":
     print("Autor: Christopher Gertig")
     print("Version: 0.3 - Dezember 2024")
     print("="*50 + "\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="critical")
+    if WORKERS > 1:
+        # Ein Ingest-Prozess für das X32, dazu WORKERS HTTP/WebSocket-Prozesse
+        ingest = subprocess.Popen([sys.executable, "ingest.py"], cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS, log_level="critical")
+        finally:
+            ingest.terminate()
+            ingest.wait()
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_level="critical")
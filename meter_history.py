@@ -0,0 +1,110 @@
+"""
+X32 Simple Controller - Verlauf und Statistik der Meter-Daten
+Autor: Christopher Gertig
+
+Jedes Meter-Frame wird in 0.25-dB-Schritten (1 Byte pro Meter, siehe meters.py)
+in einen Ringpuffer fester Größe geschrieben. Peak-Hold, RMS über den Puffer und
+Clip-Zähler werden beim Eintreffen jedes Frames fortgeschrieben.
+"""
+
+import numpy as np
+
+from meters import quantize_db, METER_DB_STEP, METER_SILENCE
+
+# Lineares Quadrat (Leistung) je Quantisierungsstufe, Stille = 0
+_POWER = 10.0 ** (np.arange(256) * (-METER_DB_STEP / 10.0))
+_POWER[METER_SILENCE] = 0.0
+
+
+def steps_to_db(steps):
+    """uint8 steps -> list of dB values, None for silence"""
+    return [None if step >= METER_SILENCE else -step * METER_DB_STEP for step in np.asarray(steps).tolist()]
+
+
+# Ringpuffer für eine Meter-Bank: capacity Frames mit je count Metern
+class MeterHistory:
+    def __init__(self, capacity, count, peak_hold=2.0, clip_db=0.0):
+        self.capacity = capacity
+        self.count = count
+        self._frames = np.full((capacity, count), METER_SILENCE, dtype=np.uint8)
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._next = 0     # nächste Schreibposition
+        self._size = 0     # Anzahl gültiger Frames
+        self._peak_hold_time = peak_hold
+        self._clip_step = int(round(-clip_db / METER_DB_STEP))
+        # Laufende Summe der Leistung über den Puffer für den RMS-Wert
+        self._power_sum = np.zeros(count, dtype=np.float64)
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset peak, peak-hold and clip counters (the history itself is kept)"""
+        self._peak = np.full(self.count, METER_SILENCE, dtype=np.uint8)
+        self._hold = np.full(self.count, METER_SILENCE, dtype=np.uint8)
+        self._hold_until = np.zeros(self.count, dtype=np.float64)
+        self._clips = np.zeros(self.count, dtype=np.int64)
+
+    def record(self, meters_db, now):
+        """Store one frame and update the running statistics"""
+        steps = quantize_db(meters_db)
+        slot = self._next
+        if self._size == self.capacity:
+            # Ältestes Frame fällt aus dem Puffer und aus der RMS-Summe
+            self._power_sum -= _POWER[self._frames[slot]]
+        else:
+            self._size += 1
+        self._frames[slot] = steps
+        self._times[slot] = now
+        self._next = (slot + 1) % self.capacity
+        self._power_sum += _POWER[steps]
+
+        # Weniger Dämpfung = lauter
+        np.minimum(self._peak, steps, out=self._peak)
+        hold = (steps <= self._hold) | (now >= self._hold_until)
+        self._hold[hold] = steps[hold]
+        self._hold_until[hold] = now + self._peak_hold_time
+        self._clips += steps <= self._clip_step
+
+    def _ordered(self):
+        """Frames and timestamps from oldest to newest (copies)"""
+        if self._size < self.capacity:
+            return self._frames[:self._size], self._times[:self._size]
+        order = np.r_[self._next:self.capacity, 0:self._next]
+        return self._frames[order], self._times[order]
+
+    def stats(self, meters):
+        """Peak-hold, peak, RMS over the buffer and clip counts for the given meter indices"""
+        with np.errstate(divide="ignore"):
+            rms = 10.0 * np.log10(self._power_sum[meters] / max(self._size, 1))
+        return {
+            "frames": self._size,
+            "peak_hold": steps_to_db(self._hold[meters]),
+            "peak": steps_to_db(self._peak[meters]),
+            "rms": [None if not np.isfinite(value) else round(float(value), 2) for value in rms],
+            "clips": self._clips[meters].tolist(),
+        }
+
+    def downsample(self, meters, points, start, end):
+        """History between start and end reduced to points time buckets
+        Each bucket keeps the minimum and maximum level, so short peaks survive.
+        Empty buckets (no frames, e.g. no connection) are None.
+        """
+        frames, times = self._ordered()
+        edges = np.linspace(start, end, points + 1)
+        bounds = np.searchsorted(times, edges)
+        lower, upper = bounds[:-1], bounds[1:]
+        filled = upper > lower
+        # Frames nach end gehören zu keinem Bucket
+        selected = frames[:upper[-1], meters]
+        low = np.full((points, len(meters)), METER_SILENCE, dtype=np.uint8)
+        high = np.full((points, len(meters)), METER_SILENCE, dtype=np.uint8)
+        if filled.any() and len(selected):
+            starts = lower[filled]
+            # reduceat über die Anfangsindizes der nicht-leeren Buckets; sie liegen
+            # direkt hintereinander, die leeren dazwischen enthalten keine Frames
+            low[filled] = np.maximum.reduceat(selected, starts, axis=0)
+            high[filled] = np.minimum.reduceat(selected, starts, axis=0)
+        result = {"t": ((edges[:-1] + edges[1:]) / 2).round(3).tolist(), "min": [], "max": []}
+        for column in range(len(meters)):
+            result["min"].append([db if ok else None for db, ok in zip(steps_to_db(low[:, column]), filled)])
+            result["max"].append([db if ok else None for db, ok in zip(steps_to_db(high[:, column]), filled)])
+        return result
@@ -0,0 +1,76 @@
+"""
+X32 Simple Controller - Dekodierung der X32 Meter-Daten
+Autor: Christopher Gertig
+"""
+
+import struct
+
+import numpy as np
+
+# Anzahl der Meter-Werte je Bank (laut X32 OSC-Dokumentation). Die tatsächliche
+# Anzahl steht zusätzlich im Blob selbst und wird beim Dekodieren verwendet.
+METER_BANK_SIZES = {
+    "/meters/0": 70,   # 32 Eingänge, 8 Aux-Returns, 8 FX-Returns, 16 Busse, 6 Matrizen
+    "/meters/1": 96,   # 32 Eingänge, 32 Gate- und 32 Dynamik-Gain-Reduction
+    "/meters/2": 49,   # 16 Busse, 6 Matrizen, Main LR, Mono und weitere Ausgänge
+}
+
+# Position von Main L/R im Array von /meters/2
+MAIN_LR_BANK = "/meters/2"
+MAIN_LR_INDEX = (16, 22)
+
+_HEADER = struct.Struct("<i")
+
+
+def decode_meter_blob(blob):
+    """Return the linear levels of a /meters blob as a float32 view of the blob
+    Format: <int count little-endian><float32 little-endian>...
+    """
+    view = memoryview(blob)
+    if len(view) < _HEADER.size:
+        return np.empty(0, dtype=np.float32)
+    count = _HEADER.unpack_from(view, 0)[0]
+    # Nur so viele Werte lesen, wie tatsächlich im Blob stehen
+    count = max(0, min(count, (len(view) - _HEADER.size) // 4))
+    return np.frombuffer(view, dtype="<f4", count=count, offset=_HEADER.size)
+
+
+def levels_to_db(levels):
+    """Convert linear levels (1.0 = 0 dB) to dB; silence becomes -inf"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (20.0 * np.log10(np.maximum(levels, 0.0))).astype(np.float32, copy=False)
+
+
+# Binäres Meter-Frame für WebSocket-Clients:
+#   uint8  Frame-Typ (METER_FRAME_TYPE)
+#   uint8  Nummer der Meter-Bank (z.B. 2 für /meters/2)
+#   uint16 Anzahl der Werte (little-endian)
+#   uint8  je Wert: Dämpfung in 0.25-dB-Schritten (0 = 0 dB, 255 = Stille / unter -63.75 dB)
+METER_FRAME_TYPE = 0x01
+METER_FRAME_HEADER = struct.Struct("<BBH")
+METER_DB_STEP = 0.25
+METER_SILENCE = 255
+
+
+def quantize_db(meters_db):
+    """dB array -> uint8 attenuation steps (METER_SILENCE for silence)"""
+    steps = np.nan_to_num(np.rint(meters_db * (-1.0 / METER_DB_STEP)), nan=METER_SILENCE)
+    return np.clip(steps, 0, METER_SILENCE).astype(np.uint8)
+
+
+def encode_meter_frame(bank, meters_db):
+    """Quantize a dB array into a compact binary WebSocket frame"""
+    quantized = quantize_db(meters_db)
+    bank_number = int(bank.rpartition("/")[2])
+    return METER_FRAME_HEADER.pack(METER_FRAME_TYPE, bank_number, len(quantized)) + quantized.tobytes()
+
+
+def decode_meter_frame(frame):
+    """Binary WebSocket frame -> (bank address, dB array); inverse of encode_meter_frame
+    Used by worker processes, which receive meters from the ingest process in this format.
+    """
+    _, bank_number, count = METER_FRAME_HEADER.unpack_from(frame, 0)
+    steps = np.frombuffer(frame, dtype=np.uint8, count=count, offset=METER_FRAME_HEADER.size)
+    meters_db = steps * np.float32(-METER_DB_STEP)
+    meters_db[steps == METER_SILENCE] = -np.inf
+    return f"/meters/{bank_number}", meters_db
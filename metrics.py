@@ -0,0 +1,157 @@
+"""
+X32 Simple Controller - Messwerte im Prometheus-Textformat
+Autor: Christopher Gertig
+
+Die Messung ist erst aktiv, nachdem /metrics zum ersten Mal abgefragt wurde.
+Bis dahin kostet jede Messstelle nur die Abfrage von `metrics.enabled`.
+Bei mehreren Prozessen liefert jeder Worker mit snapshot() seine Werte, der
+Ingest-Prozess addiert sie beim Ausgeben mit render(remote).
+"""
+
+import bisect
+import math
+
+enabled = False
+
+# Zeit-Buckets in Sekunden (100 µs bis 1 s)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_registry = []
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        return [[list(label_values), value] for label_values, value in self._values.items()]
+
+    def render(self, remote=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        values = dict(self._values)
+        for data in remote:
+            for label_values, value in data:
+                label_values = tuple(label_values)
+                values[label_values] = values.get(label_values, 0) + value
+        values = values or ({} if self.labels else {(): 0})
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time
+    merge: combines the values of the worker processes (e.g. sum); without it only
+    the own value is shown
+    """
+
+    def __init__(self, name, help_text, callback, merge=None):
+        self.name = name
+        self.help = help_text
+        self._callback = callback
+        self._merge = merge
+        _registry.append(self)
+
+    def snapshot(self):
+        return self._callback() if self._merge is not None else None
+
+    def render(self, remote=None):
+        # Werte pro Client kommen bei mehreren Prozessen aus den Workern
+        value = self._merge(remote) if self._merge is not None and remote is not None else self._callback()
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(value)}"]
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        _registry.append(self)
+
+    def observe(self, value):
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def snapshot(self):
+        return {"counts": self._counts, "sum": self._sum, "count": self._count}
+
+    def render(self, remote=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        counts = list(self._counts)
+        total, count = self._sum, self._count
+        for data in remote:
+            counts = [a + b for a, b in zip(counts, data["counts"])]
+            total += data["sum"]
+            count += data["count"]
+        cumulative = 0
+        for bound, bucket in zip(self._buckets + (math.inf,), counts):
+            cumulative += bucket
+            lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+def osc_family(address):
+    """Address family for labels, e.g. /ch/01/mix/fader -> ch"""
+    return address[1:].partition("/")[0] or "root"
+
+
+def snapshot():
+    """Values of this process for render() in another one; switches measuring on as well"""
+    global enabled
+    enabled = True
+    values = {metric.name: metric.snapshot() for metric in _registry}
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def render(remote=None):
+    """Render all metrics; the first call switches measuring on
+    remote: snapshots of the worker processes to add in (ingest process only)
+    """
+    global enabled
+    enabled = True
+    lines = []
+    for metric in _registry:
+        if remote is None:
+            lines.extend(metric.render())
+        else:
+            lines.extend(metric.render([data[metric.name] for data in remote if metric.name in data]))
+    return "\n".join(lines) + "\n"
+
+
+# Messstellen im Datenpfad
+osc_packets = Counter("x32_osc_messages_total", "OSC messages to and from the X32", ("direction", "family"))
+update_latency = Histogram("x32_update_latency_seconds",
+                           "Time from an X32 packet to the WebSocket send of the resulting update")
+client_send_lag = Histogram("x32_client_send_lag_seconds",
+                            "Time an update waits in a client's send buffer")
+client_dropped = Counter("x32_client_dropped_updates_total", "Updates dropped from full client send buffers")
+client_disconnects = Counter("x32_client_lag_disconnects_total", "Clients disconnected for lagging")
+meter_decode = Histogram("x32_meter_decode_seconds", "Time to decode one meter bank in _handle_meters")
+reconnects = Counter("x32_reconnects_total", "Reconnect attempts to the X32")
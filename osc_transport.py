@@ -0,0 +1,95 @@
+"""
+X32 Simple Controller - OSC-Transport auf Basis von asyncio
+Autor: Christopher Gertig
+"""
+
+import asyncio
+import logging
+
+from pythonosc import osc_bundle_builder, osc_message_builder, osc_packet
+
+import metrics
+from capture import CAPTURE_IN, CAPTURE_OUT
+
+logger = logging.getLogger(__name__)
+
+
+def _message_builder(address, value):
+    builder = osc_message_builder.OscMessageBuilder(address=address)
+    if value is None:
+        values = []
+    elif isinstance(value, (list, tuple)):
+        values = value
+    else:
+        values = [value]
+    for val in values:
+        builder.add_arg(val)
+    return builder
+
+
+def build_message(address, value=None):
+    """Build an OSC datagram with the same argument rules as SimpleUDPClient"""
+    return _message_builder(address, value).build().dgram
+
+
+def build_bundle(messages, timestamp=osc_bundle_builder.IMMEDIATELY):
+    """Build one OSC bundle datagram from (address, value) pairs
+    timestamp: time.time() value for the bundle time tag, default "immediately"
+    """
+    bundle = osc_bundle_builder.OscBundleBuilder(timestamp)
+    for address, value in messages:
+        bundle.add_content(_message_builder(address, value).build())
+    return bundle.build().dgram
+
+
+# UDP-Protokoll, das OSC-Pakete direkt auf dem Event-Loop empfängt und verteilt
+class X32Protocol(asyncio.DatagramProtocol):
+    def __init__(self, dispatcher, remote_address, capture=None):
+        self._dispatcher = dispatcher
+        self._remote_address = remote_address
+        self._capture = capture  # optionaler Mitschnitt (capture.CaptureLog)
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        if exc:
+            logger.error("OSC transport closed: %s", exc)
+        self._transport = None
+
+    def error_received(self, exc):
+        logger.error("OSC transport error: %s", exc)
+
+    def datagram_received(self, data, addr):
+        if self._capture is not None:
+            self._capture.record(CAPTURE_IN, data)
+        try:
+            packet = osc_packet.OscPacket(data)
+        except osc_packet.ParseError:
+            logger.warning("Discarding unparsable OSC packet from %s", addr)
+            return
+
+        # Verteilung direkt auf dem Event-Loop, ohne Thread pro Paket
+        for timed_msg in packet.messages:
+            message = timed_msg.message
+            if metrics.enabled:
+                metrics.osc_packets.inc("in", metrics.osc_family(message.address))
+            try:
+                self._dispatcher.dispatch(message, addr)
+            except Exception as e:
+                logger.error(f"Error in OSC handler for {message.address}: {e}")
+
+    def send_message(self, address, value=None):
+        """Send a single OSC message to the X32"""
+        self.send_packet(build_message(address, value))
+        if metrics.enabled:
+            metrics.osc_packets.inc("out", metrics.osc_family(address))
+
+    def send_packet(self, dgram):
+        """Send a prebuilt OSC message or bundle to the X32"""
+        if self._transport is None:
+            raise ConnectionError("OSC transport is not open")
+        self._transport.sendto(dgram, self._remote_address)
+        if self._capture is not None:
+            self._capture.record(CAPTURE_OUT, dgram)
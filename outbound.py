@@ -0,0 +1,107 @@
+"""
+X32 Simple Controller - Gedrosseltes Senden von Änderungen an das X32
+Autor: Christopher Gertig
+"""
+
+import asyncio
+import logging
+import time
+
+import metrics
+from config import X32_SEND_RATE, X32_ECHO_WINDOW
+from osc_transport import build_message, build_bundle
+
+logger = logging.getLogger(__name__)
+
+# Toleranz beim Vergleich von Echos (der X32 rundet Faderwerte auf 1024 Stufen)
+ECHO_TOLERANCE = 1.0 / 1024
+
+
+# Sammelt ausgehende Werte pro OSC-Pfad und sendet pro Takt ein einziges Paket
+class OutboundScheduler:
+    def __init__(self, send_packet, rate=X32_SEND_RATE, echo_window=X32_ECHO_WINDOW):
+        self._send_packet = send_packet
+        self._interval = 1.0 / rate
+        self._echo_window = echo_window
+        self._pending = {}  # Pfad -> neuester noch nicht gesendeter Wert
+        self._sent = {}     # Pfad -> (gesendeter Wert, Ablaufzeit der Echo-Unterdrückung)
+        self._wakeup = asyncio.Event()
+
+    def submit(self, path, value):
+        """Queue a value; a newer value for the same path replaces it"""
+        self._pending[path] = value
+        self._wakeup.set()
+
+    def submit_many(self, changes):
+        """Queue several (path, value) changes for the same tick"""
+        for path, value in changes:
+            self._pending[path] = value
+        self._wakeup.set()
+
+    def discard(self, path):
+        """Drop a value that has not been sent yet"""
+        self._pending.pop(path, None)
+
+    def is_recent(self, path):
+        """True while a value for path is queued or its echo may still arrive"""
+        if path in self._pending:
+            return True
+        sent = self._sent.get(path)
+        return sent is not None and time.monotonic() <= sent[1]
+
+    def is_echo(self, path, args):
+        """True if args is the console echoing a value we sent a moment ago"""
+        sent = self._sent.get(path)
+        if sent is None:
+            return False
+        value, expires = sent
+        if time.monotonic() > expires:
+            del self._sent[path]
+            return False
+        if not args:
+            return False
+        received = args[0]
+        if isinstance(value, float) and isinstance(received, (int, float)):
+            return abs(received - value) <= ECHO_TOLERANCE
+        return received == value
+
+    def send_now(self, changes, timestamp):
+        """Send (path, value) changes together with everything pending as one
+        time-tagged bundle right away, without waiting for the next tick
+        """
+        for path, value in changes:
+            self._pending[path] = value
+        self.flush(timestamp)
+
+    def flush(self, timestamp=None):
+        """Send everything pending now as one message or bundle"""
+        if not self._pending:
+            return
+        changes = list(self._pending.items())
+        self._pending.clear()
+
+        if timestamp is not None:
+            dgram = build_bundle(changes, timestamp)
+        elif len(changes) == 1:
+            dgram = build_message(*changes[0])
+        else:
+            dgram = build_bundle(changes)
+        self._send_packet(dgram)
+        if metrics.enabled:
+            for path, _ in changes:
+                metrics.osc_packets.inc("out", metrics.osc_family(path))
+
+        expires = time.monotonic() + self._echo_window
+        for path, value in changes:
+            self._sent[path] = (value, expires)
+
+    async def run(self):
+        """Send pending changes at most once per tick"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error sending to X32: {e}")
+            await asyncio.sleep(self._interval)
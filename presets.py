@@ -0,0 +1,96 @@
+"""
+X32 Simple Controller - Presets (Faderstände und Mutes der zugeordneten Kanäle)
+Autor: Christopher Gertig
+
+Ein Preset: {"faders": {Kanalname: 0.0-1.0}, "mutes": {Kanalname: 0/1}}
+Mutes werden wie am X32 als "on"-Wert gespeichert (0 = stumm).
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def validate_preset(preset, channels):
+    """Check a preset against the known channel names; returns a cleaned copy"""
+    if not isinstance(preset, dict):
+        raise ValueError("Preset must be an object")
+    faders = preset.get("faders", {})
+    mutes = preset.get("mutes", {})
+    if not isinstance(faders, dict) or not isinstance(mutes, dict):
+        raise ValueError("faders and mutes must be objects")
+    unknown = (set(faders) | set(mutes)) - set(channels)
+    if unknown:
+        raise ValueError(f"Unknown channels: {', '.join(sorted(unknown))}")
+    cleaned = {"faders": {}, "mutes": {}}
+    for channel, value in faders.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0.0 <= value <= 1.0:
+            raise ValueError(f"Fader value for {channel} must be between 0 and 1")
+        cleaned["faders"][channel] = float(value)
+    for channel, value in mutes.items():
+        cleaned["mutes"][channel] = 1 if value else 0
+    if not cleaned["faders"] and not cleaned["mutes"]:
+        raise ValueError("Preset is empty")
+    return cleaned
+
+
+# Benannte Presets, gespeichert als JSON-Datei
+class PresetStore:
+    def __init__(self, path, channels):
+        self._path = path
+        self._channels = list(channels)
+        self._presets = {}
+
+    def load(self):
+        """Read the preset file; a missing file means no presets"""
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                presets = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read presets from {self._path}: {e}")
+            return
+        for name, preset in presets.items():
+            try:
+                self._presets[name] = validate_preset(preset, self._channels)
+            except ValueError as e:
+                logger.error(f"Ignoring preset {name}: {e}")
+
+    def save_file(self):
+        """Write all presets (atomically, so a crash never leaves half a file)"""
+        temp_path = self._path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._presets, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self._path)
+
+    def names(self):
+        return sorted(self._presets)
+
+    def get(self, name):
+        return self._presets.get(name)
+
+    def all(self):
+        return dict(self._presets)
+
+    def set(self, name, preset):
+        """Validate and store a preset in memory; call save_file() to persist"""
+        self._presets[name] = validate_preset(preset, self._channels)
+        return self._presets[name]
+
+    def delete(self, name):
+        return self._presets.pop(name, None) is not None
+
+    def capture(self, mixer_state):
+        """Preset from the mirrored console state (channels without a known value are left out)"""
+        preset = {"faders": {}, "mutes": {}}
+        for channel in self._channels:
+            fader = mixer_state.get("fader", channel)
+            mute = mixer_state.get("mute", channel)
+            if fader is not None:
+                preset["faders"][channel] = fader
+            if mute is not None:
+                preset["mutes"][channel] = mute
+        return preset
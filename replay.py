@@ -0,0 +1,120 @@
+"""
+X32 Simple Controller - Abspielen eines OSC-Mitschnitts
+Autor: Christopher Gertig
+
+Liest eine mit CAPTURE_FILE aufgezeichnete Logdatei per mmap und speist alle vom X32
+empfangenen Pakete in den X32Dispatcher ein, in Originalgeschwindigkeit oder so schnell
+wie möglich (Messung des Ingest-Pfads mit echtem Show-Verkehr). Gesendete Pakete werden
+nur gezählt bzw. mit --dump angezeigt.
+
+Start: python replay.py x32-capture.bin [--fast | --speed 2] [--session 1] [--dump]
+"""
+
+import argparse
+import asyncio
+import mmap
+import time
+
+from pythonosc import osc_packet
+
+from capture import read_records, CAPTURE_IN, CAPTURE_SESSION, SESSION_PAYLOAD
+from osc_transport import X32Protocol
+
+
+def describe(payload):
+    """Short text form of an OSC packet for --dump"""
+    try:
+        messages = osc_packet.OscPacket(payload).messages
+    except osc_packet.ParseError:
+        return f"<unparsable, {len(payload)} bytes>"
+    parts = []
+    for timed_msg in messages:
+        args = [f"<blob {len(arg)} bytes>" if isinstance(arg, bytes) else repr(arg)
+                for arg in timed_msg.message.params]
+        parts.append(" ".join([timed_msg.message.address] + args))
+    return " | ".join(parts)
+
+
+async def replay(path, fast=False, speed=1.0, session=None, dump=False):
+    """Feed the inbound packets of a log into a fresh dispatcher; returns statistics"""
+    import main  # Dispatcher und Zustandsspiegel, ohne Verbindung zum X32
+    dispatcher = main.X32Dispatcher(blocks=main.CONSOLE_BLOCKS)
+    protocol = X32Protocol(dispatcher, None)
+    conflator_task = asyncio.create_task(main.conflator.run())
+
+    stats = {"sessions": 0, "received": 0, "sent": 0, "bytes": 0, "log_seconds": 0.0}
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log:
+        records = read_records(log)
+        payload = None
+        started = time.perf_counter()
+        base = None  # (Zeitstempel im Log, perf_counter) des ersten Pakets der Sitzung
+        first = last = None
+        try:
+            for timestamp, direction, payload in records:
+                if direction == CAPTURE_SESSION:
+                    stats["sessions"] += 1
+                    base = None
+                    if dump:
+                        wall = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(SESSION_PAYLOAD.unpack(payload)[0]))
+                        print(f"--- Sitzung {stats['sessions']} ({wall})")
+                    continue
+                if session is not None and stats["sessions"] != session:
+                    continue
+                if base is None:
+                    base = (timestamp, time.perf_counter())
+                    first = first if first is not None else timestamp
+                elif not fast:
+                    # Originalabstände einhalten (geteilt durch speed)
+                    delay = base[1] + (timestamp - base[0]) / 1e9 / speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                last = timestamp
+                data = bytes(payload)
+                if dump:
+                    arrow = "<" if direction == CAPTURE_IN else ">"
+                    print(f"{(timestamp - base[0]) / 1e9:10.3f} {arrow} {describe(data)}")
+                if direction == CAPTURE_IN:
+                    protocol.datagram_received(data, None)
+                    stats["received"] += 1
+                    stats["bytes"] += len(data)
+                else:
+                    stats["sent"] += 1
+        finally:
+            # Alle Sichten auf die mmap freigeben, bevor sie geschlossen wird
+            payload = None
+            records.close()
+        stats["replay_seconds"] = time.perf_counter() - started
+    if first is not None and (session is not None or stats["sessions"] <= 1):
+        stats["log_seconds"] = (last - first) / 1e9
+
+    # Letzte zusammengefasste Updates noch durchlaufen lassen
+    await asyncio.sleep(0.1)
+    conflator_task.cancel()
+    stats["version"] = main.mixer_state.version
+    stats["known"] = sum(dispatcher.get_value(path) is not None for path in main.CONSOLE_PATHS)
+    stats["parameters"] = len(main.CONSOLE_PATHS)
+    return stats
+
+
+def report(stats):
+    received, seconds = stats["received"], stats["replay_seconds"]
+    print(f"Sitzungen im Log:        {stats['sessions']}")
+    print(f"Pakete vom X32:          {received} ({stats['bytes'] / 1024:.1f} KiB), an das X32: {stats['sent']}")
+    if stats["log_seconds"]:
+        print(f"Dauer im Log:            {stats['log_seconds']:.2f} s")
+    print(f"Abspieldauer:            {seconds:.2f} s")
+    if received and seconds > 0:
+        print(f"Durchsatz:               {received / seconds:.0f} Pakete/s ({seconds / received * 1e6:.1f} µs pro Paket)")
+    print(f"Zustandsversion am Ende: {stats['version']}")
+    print(f"Bekannte Parameter:      {stats['known']} von {stats['parameters']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OSC-Mitschnitt in den X32Dispatcher einspielen")
+    parser.add_argument("log", help="Logdatei (CAPTURE_FILE in config.py)")
+    parser.add_argument("--fast", action="store_true", help="so schnell wie möglich statt in Originalgeschwindigkeit")
+    parser.add_argument("--speed", type=float, default=1.0, help="Zeitraffer-Faktor für das Abspielen")
+    parser.add_argument("--session", type=int, help="nur diese Sitzung (1 = erste) abspielen")
+    parser.add_argument("--dump", action="store_true", help="jedes Paket ausgeben")
+    args = parser.parse_args()
+    report(asyncio.run(replay(args.log, fast=args.fast, speed=args.speed, session=args.session, dump=args.dump)))
@@ -0,0 +1,97 @@
+"""
+X32 Simple Controller - Vorberechnete OSC-Adresstabellen
+Autor: Christopher Gertig
+"""
+
+# Größe des X32: Eingangskanäle, Aux-Eingänge, Mix-Busse, Matrizen, DCAs und Meter-Bänke
+CHANNEL_COUNT = 32
+AUX_COUNT = 8
+BUS_COUNT = 16
+MATRIX_COUNT = 6
+DCA_COUNT = 8
+METER_BANK_COUNT = 16
+
+# Höchstzahl von Adressen in einem /formatsubscribe (Antwort: ein Blob mit 4 Byte pro Wert)
+SUBSCRIPTION_LIMIT = 64
+
+
+def channel_path(channel_num, param):
+    """OSC path of a channel parameter, e.g. /ch/01/mix/fader"""
+    return f"/ch/{channel_num:02d}/mix/{param}"
+
+
+def console_strips():
+    """(config prefix, mix prefix) of every strip with a fader, e.g. ("/ch/01", "/ch/01/mix")"""
+    strips = [(f"/ch/{num:02d}", f"/ch/{num:02d}/mix") for num in range(1, CHANNEL_COUNT + 1)]
+    strips += [(f"/auxin/{num:02d}", f"/auxin/{num:02d}/mix") for num in range(1, AUX_COUNT + 1)]
+    strips += [(f"/bus/{num:02d}", f"/bus/{num:02d}/mix") for num in range(1, BUS_COUNT + 1)]
+    strips += [(f"/mtx/{num:02d}", f"/mtx/{num:02d}/mix") for num in range(1, MATRIX_COUNT + 1)]
+    strips += [("/main/st", "/main/st/mix"), ("/main/m", "/main/m/mix")]
+    # DCAs haben Fader und Mute direkt unter /dca/N
+    strips += [(f"/dca/{num}", f"/dca/{num}") for num in range(1, DCA_COUNT + 1)]
+    return strips
+
+
+def build_console_paths():
+    """Every mirrored OSC path of the console with its OSC type ("f", "i" or "s")
+    Faders, mutes, names and colours of all strips, plus the matrix sends of
+    buses and main outputs.
+    """
+    paths = {}
+    for config, mix in console_strips():
+        paths[f"{mix}/fader"] = "f"
+        paths[f"{mix}/on"] = "i"
+        paths[f"{config}/config/name"] = "s"
+        paths[f"{config}/config/color"] = "i"
+    senders = [f"/bus/{num:02d}/mix" for num in range(1, BUS_COUNT + 1)] + ["/main/st/mix", "/main/m/mix"]
+    for mix in senders:
+        for num in range(1, MATRIX_COUNT + 1):
+            paths[f"{mix}/{num:02d}/on"] = "i"
+            paths[f"{mix}/{num:02d}/level"] = "f"
+    return paths
+
+
+def partition_subscriptions(console_paths, limit=SUBSCRIPTION_LIMIT):
+    """Numeric paths split into blocks of at most limit paths, one /formatsubscribe each
+    Names are strings and cannot be part of the blob; they are read once and
+    then follow /xremote.
+    """
+    numeric = [path for path, osc_type in console_paths.items() if osc_type != "s"]
+    return [numeric[i:i + limit] for i in range(0, len(numeric), limit)]
+
+
+def build_routes(channel_mapping):
+    """Map every exact inbound OSC address to (kind, channel name)
+    Unmapped channels get None as name; their values are stored but not broadcast.
+    """
+    names = {num: name for name, num in channel_mapping.items()}
+    routes = {
+        "/xinfo": ("xinfo", None),
+        "/main/st/mix/fader": ("fader", "master"),
+        "/main/st/mix/on": ("mute", "master"),
+        "/main/st/config/name": ("name", "master"),
+    }
+    for num in range(1, CHANNEL_COUNT + 1):
+        routes[channel_path(num, "fader")] = ("fader", names.get(num))
+        routes[channel_path(num, "on")] = ("mute", names.get(num))
+        routes[f"/ch/{num:02d}/config/name"] = ("name", names.get(num))
+    # Übriges Mischpult: Fader, Mutes und Namen ohne Client-Namen, sonstige Werte nur gespeichert
+    kinds = {"fader": "fader", "on": "mute", "name": "name"}
+    for path in build_console_paths():
+        if path not in routes:
+            routes[path] = (kinds.get(path.rsplit("/", 1)[1], "param"), None)
+    for num in range(METER_BANK_COUNT + 1):
+        routes[f"/meters/{num}"] = ("meters", None)
+    return routes
+
+
+def build_command_paths(channel_mapping):
+    """Map (command type, channel name) from /ws to the outbound OSC path"""
+    paths = {
+        ("fader", "master"): "/main/st/mix/fader",
+        ("mute", "master"): "/main/st/mix/on",
+    }
+    for name, num in channel_mapping.items():
+        paths[("fader", name)] = channel_path(num, "fader")
+        paths[("mute", name)] = channel_path(num, "on")
+    return paths
@@ -0,0 +1,87 @@
+"""
+X32 Simple Controller - Ein gemeinsamer Timer für alle periodischen Aufgaben
+Autor: Christopher Gertig
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ("interval", "callback", "seq")
+
+    def __init__(self, interval, callback, seq):
+        self.interval = interval
+        self.callback = callback
+        self.seq = seq
+
+
+# Alle Jobs liegen nach Fälligkeit sortiert in einem Heap; ein einziger Task
+# schläft jeweils bis zum nächsten fälligen Job
+class TimerScheduler:
+    def __init__(self):
+        self._jobs = {}  # Name -> _Job
+        self._heap = []  # (Fälligkeit, seq, Name); veraltete Einträge werden übersprungen
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def every(self, name, interval, callback, delay=0.0):
+        """Run callback every interval seconds, first after delay; replaces a job with the same name"""
+        self._schedule(name, _Job(interval, callback, next(self._seq)), delay)
+
+    def call_later(self, name, delay, callback):
+        """Run callback once after delay; replaces a job with the same name"""
+        self._schedule(name, _Job(None, callback, next(self._seq)), delay)
+
+    def cancel(self, name):
+        """Stop a job; it is simply ignored when its heap entry comes up"""
+        self._jobs.pop(name, None)
+
+    def is_active(self, name):
+        return name in self._jobs
+
+    def _schedule(self, name, job, delay):
+        self._jobs[name] = job
+        heapq.heappush(self._heap, (time.monotonic() + delay, job.seq, name))
+        self._wakeup.set()
+
+    def _run_job(self, name, job):
+        try:
+            result = job.callback()
+            # Koroutinen (z.B. Wiederverbinden) laufen als eigener Task weiter
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        except Exception as e:
+            logger.error(f"Error in scheduled job {name}: {e}")
+
+    async def run(self):
+        """Single timer loop for all jobs"""
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                due, seq, name = heapq.heappop(self._heap)
+                job = self._jobs.get(name)
+                if job is None or job.seq != seq:
+                    continue
+                if job.interval is None:
+                    del self._jobs[name]
+                self._run_job(name, job)
+                if job.interval is not None and self._jobs.get(name) is job:
+                    # Bei Verzögerung nicht nachholen, sondern ab jetzt weiterzählen
+                    next_due = due + job.interval
+                    if next_due <= now:
+                        next_due = now + job.interval
+                    heapq.heappush(self._heap, (next_due, seq, name))
+
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,70 @@
+"""
+X32 Simple Controller - Spiegel des Mischpult-Zustands im Speicher
+Autor: Christopher Gertig
+"""
+
+STATE_KINDS = ("fader", "mute", "name")
+
+
+# Aktueller Zustand aller zugeordneten Kanäle mit fortlaufender Versionsnummer
+class MixerState:
+    def __init__(self):
+        self.version = 0
+        self._state = {kind: {} for kind in STATE_KINDS}
+        self._meters = {"left": None, "right": None}
+        self._connection = {"state": "connecting", "console": None}
+
+    def update(self, kind, channel, value):
+        """Store a value; returns the new version or None if nothing changed"""
+        values = self._state[kind]
+        if channel in values and values[channel] == value:
+            return None
+        values[channel] = value
+        self.version += 1
+        return self.version
+
+    def get(self, kind, channel):
+        """Get the mirrored value of a channel"""
+        return self._state[kind].get(channel)
+
+    def update_meters(self, left, right):
+        """Remember the latest Main LR levels (not versioned, they change constantly)"""
+        self._meters["left"] = left
+        self._meters["right"] = right
+
+    def set_connection(self, state, console=None):
+        """Remember the X32 link state ("connecting" or "connected"); returns the client message"""
+        self._connection = {"state": state, "console": console}
+        return {"type": "connection", **self._connection}
+
+    def apply(self, message):
+        """Mirror a state message from the ingest process (worker processes only)"""
+        kind = message.get("type")
+        if kind == "snapshot":
+            for state_kind, key in (("fader", "faders"), ("mute", "mutes"), ("name", "names")):
+                self._state[state_kind] = dict(message[key])
+            self._meters = dict(message["meters"])
+            self._connection = dict(message["connection"])
+            self.version = message["version"]
+        elif kind == "batch":
+            for item in message["messages"]:
+                self.apply(item)
+        elif kind in STATE_KINDS:
+            self._state[kind][message["channel"]] = message["value"]
+            self.version = max(self.version, message["version"])
+        elif kind == "meters":
+            self.update_meters(message["left"], message["right"])
+        elif kind == "connection":
+            self.set_connection(message["state"], message["console"])
+
+    def snapshot(self):
+        """Full state as one message for a joining client"""
+        return {
+            "type": "snapshot",
+            "version": self.version,
+            "faders": dict(self._state["fader"]),
+            "mutes": dict(self._state["mute"]),
+            "names": dict(self._state["name"]),
+            "meters": dict(self._meters),
+            "connection": dict(self._connection),
+        }
@@ -11,6 +11,30 @@ const RECONNECT_DELAY = 1000; // Initiale Wiederverbindungsverzögerung: 1 Sekun
 const MAX_RECONNECT_DELAY = 5000; // Maximale Verzögerung: 5 Sekunden
 let currentReconnectDelay = RECONNECT_DELAY;
 
+// Version des zuletzt erhaltenen Server-Zustands (ältere Updates werden ignoriert)
+let stateVersion = 0;
+// Version des letzten Updates pro Typ und Kanal (z.B. 'fader:HDMI')
+let channelVersions = {};
+
+// Binäre Meter-Frames (siehe meters.py): Header + ein Byte pro Meter in 0.25-dB-Schritten
+const METER_FRAME_TYPE = 0x01;
+const METER_DB_STEP = 0.25;
+const METER_SILENCE = 255;
+const MAIN_LR_BANK = 2;
+const MAIN_LR_INDEX = [16, 22];
+
+// Verbindungsstatus anzeigen (nur sichtbar, solange Server oder X32 nicht verbunden sind)
+function showConnectionState(state) {
+    const status = document.getElementById('connectionStatus');
+    const texts = {
+        server: 'Verbinde mit Server…',
+        connecting: 'Verbinde mit X32…',
+        connected: 'X32 verbunden'
+    };
+    status.textContent = texts[state] || state;
+    status.classList.toggle('connected', state === 'connected');
+}
+
 // Funktion zum Aufbau der WebSocket-Verbindung
 function connectWebSocket() {
     if (ws !== null && ws.readyState !== WebSocket.CLOSED) {
@@ -22,6 +46,7 @@ function connectWebSocket() {
     // Wähle das korrekte WebSocket-Protokoll basierend auf der Seitenverbindung
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
     ws = new WebSocket(`${protocol}//${window.location.host}/ws`);
+    ws.binaryType = 'arraybuffer';
     
     // Event-Handler für erfolgreiche Verbindung
     ws.onopen = () => {
@@ -29,11 +54,24 @@ function connectWebSocket() {
         currentReconnectDelay = RECONNECT_DELAY; // Setze Verzögerung zurück
         clearTimeout(reconnectTimeout);
         
-        // Anfrage der initialen Werte vom Server
+        // Meter-Daten als kompakte Binär-Frames anfordern
         ws.send(JSON.stringify({
-            type: 'request_initial_values'
+            type: 'meter_format',
+            format: 'binary'
         }));
         
+        // Meter nur anfordern, wenn die Seite sichtbar ist
+        if (document.hidden) {
+            ws.send(JSON.stringify({
+                type: 'meters_view',
+                active: false
+            }));
+        }
+        
+        // Der Server schickt den kompletten Zustand automatisch beim Verbinden
+        stateVersion = 0;
+        channelVersions = {};
+        
         initializeChannels();
         setupEventListeners();
     };
@@ -42,6 +80,7 @@ function connectWebSocket() {
     ws.onclose = () => {
         console.log('Verbindung zum Server abgebrochen - Versuche, erneut zu verbinden...');
         clearTimeout(reconnectTimeout);
+        showConnectionState('server');
         
         // Exponentielles Backoff mit maximaler Verzögerung
         currentReconnectDelay = Math.min(currentReconnectDelay * 1.5, MAX_RECONNECT_DELAY);
@@ -56,44 +95,18 @@ function connectWebSocket() {
     // Event-Handler für eingehende Nachrichten
     ws.onmessage = (event) => {
         try {
+            if (event.data instanceof ArrayBuffer) {
+                handleBinaryFrame(new DataView(event.data));
+                return;
+            }
+            
             const data = JSON.parse(event.data);
-            console.log('WebSocket-Nachricht empfangen:', data);
-
-            if (data.type === 'fader') {
-                // Aktualisiere Kanalfader
-                const fader = document.querySelector(`.fader[data-channel="${data.channel}"]`);
-                if (fader) {
-                    const thumb = fader.querySelector('.fader-thumb');
-                    thumb.dataset.value = data.value;
-                    const height = fader.getBoundingClientRect().height;
-                    const y = height * (1 - data.value);
-                    thumb.style.top = `${y}px`;
-                    console.log(`Fader ${data.channel} aktualisiert auf ${data.value}`);
-                }
-                
-                // Spezielle Behandlung für Master-Fader
-                if (data.channel === 'master') {
-                    const masterFader = document.querySelector('.master-fader');
-                    if (masterFader) {
-                        const thumb = masterFader.querySelector('.fader-thumb');
-                        thumb.dataset.value = data.value;
-                        const height = masterFader.getBoundingClientRect().height;
-                        const y = height * (1 - data.value);
-                        thumb.style.top = `${y}px`;
-                        console.log(`Master-Fader aktualisiert auf ${data.value}`);
-                    }
-                }
-            } else if (data.type === 'mute') {
-                // Aktualisiere Mute-Button Status
-                const button = document.querySelector(`.mute-button[data-channel="${data.channel}"]`);
-                if (button) {
-                    button.classList.toggle('muted', data.value === 0);
-                } else if (data.channel === 'master') {
-                    document.querySelector('.master-mute').classList.toggle('muted', data.value === 0);
-                }
-            } else if (data.type === 'meters') {
-                console.log('Meter-Daten empfangen:', data);
-                updateMeters(data.left, data.right);
+
+            // Der Server bündelt mehrere Updates pro Takt in einer Nachricht
+            if (data.type === 'batch') {
+                data.messages.forEach(handleMessage);
+            } else {
+                handleMessage(data);
             }
         } catch (e) {
             console.error('Fehler bei der Verarbeitung der Nachricht:', e, event.data);
@@ -101,11 +114,110 @@ function connectWebSocket() {
     };
 }
 
+// Verarbeitung eines binären Meter-Frames
+function handleBinaryFrame(view) {
+    if (view.byteLength < 4 || view.getUint8(0) !== METER_FRAME_TYPE) {
+        return;
+    }
+    const bank = view.getUint8(1);
+    const count = view.getUint16(2, true);
+    if (bank !== MAIN_LR_BANK || count <= Math.max(...MAIN_LR_INDEX)) {
+        return;
+    }
+    
+    const meterDb = (index) => {
+        const steps = view.getUint8(4 + index);
+        return steps === METER_SILENCE ? Number.NEGATIVE_INFINITY : -steps * METER_DB_STEP;
+    };
+    updateMeters(meterDb(MAIN_LR_INDEX[0]), meterDb(MAIN_LR_INDEX[1]));
+}
+
+// Übernahme des kompletten Zustands (beim Verbinden)
+function applySnapshot(data) {
+    stateVersion = data.version;
+    channelVersions = {};
+    Object.entries(data.faders).forEach(([channel, value]) => {
+        handleMessage({ type: 'fader', channel: channel, value: value });
+    });
+    Object.entries(data.mutes).forEach(([channel, value]) => {
+        handleMessage({ type: 'mute', channel: channel, value: value });
+    });
+    Object.entries(data.names).forEach(([channel, value]) => {
+        handleMessage({ type: 'name', channel: channel, value: value });
+    });
+    updateMeters(data.meters.left, data.meters.right);
+    showConnectionState(data.connection.state);
+}
+
+// Verarbeitung einer einzelnen Update-Nachricht vom Server
+function handleMessage(data) {
+    if (data.type === 'snapshot') {
+        applySnapshot(data);
+        return;
+    }
+    
+    // Updates überspringen, die schon im Snapshot enthalten waren oder älter als der
+    // letzte Wert desselben Kanals sind; über Kanäle hinweg kann die Reihenfolge abweichen
+    if (data.version !== undefined) {
+        const key = `${data.type}:${data.channel}`;
+        if (data.version <= stateVersion || data.version <= (channelVersions[key] || 0)) return;
+        channelVersions[key] = data.version;
+    }
+    
+    if (data.type === 'fader') {
+        // Aktualisiere Kanalfader (nicht während der Benutzer ihn gerade bewegt)
+        const fader = document.querySelector(`.fader[data-channel="${data.channel}"]`);
+        if (fader && !fader.querySelector('.fader-thumb.dragging')) {
+            const thumb = fader.querySelector('.fader-thumb');
+            thumb.dataset.value = data.value;
+            const height = fader.getBoundingClientRect().height;
+            const y = height * (1 - data.value);
+            thumb.style.top = `${y}px`;
+            console.log(`Fader ${data.channel} aktualisiert auf ${data.value}`);
+        }
+        
+        // Spezielle Behandlung für Master-Fader
+        if (data.channel === 'master') {
+            const masterFader = document.querySelector('.master-fader');
+            if (masterFader && !masterFader.querySelector('.fader-thumb.dragging')) {
+                const thumb = masterFader.querySelector('.fader-thumb');
+                thumb.dataset.value = data.value;
+                const height = masterFader.getBoundingClientRect().height;
+                const y = height * (1 - data.value);
+                thumb.style.top = `${y}px`;
+                console.log(`Master-Fader aktualisiert auf ${data.value}`);
+            }
+        }
+    } else if (data.type === 'mute') {
+        // Aktualisiere Mute-Button Status
+        const button = document.querySelector(`.mute-button[data-channel="${data.channel}"]`);
+        if (button) {
+            button.classList.toggle('muted', data.value === 0);
+        } else if (data.channel === 'master') {
+            document.querySelector('.master-mute').classList.toggle('muted', data.value === 0);
+        }
+    } else if (data.type === 'name') {
+        // Kanalname vom Mischpult als Tooltip anzeigen
+        const fader = document.querySelector(`.fader[data-channel="${data.channel}"]`);
+        const strip = fader ? fader.closest('.channel-strip') : null;
+        if (strip && data.value) {
+            strip.querySelector('.channel-name').title = data.value;
+        }
+    } else if (data.type === 'meters') {
+        updateMeters(data.left, data.right);
+    } else if (data.type === 'connection') {
+        showConnectionState(data.state);
+    } else if (data.type === 'error') {
+        // Abgelehnter Befehl; die Verbindung bleibt bestehen
+        console.warn(`Befehl abgelehnt (${data.code}): ${data.message}`);
+    }
+}
+
 // Meter-Aktualisierungsfunktionen
 function updateMeters(leftDb, rightDb) {
     // Konvertiere dB in Prozent (0dB = 100%, -48dB = 0%)
     function dbToPercent(db) {
-        // Stelle sicher, dass db eine Zahl ist und nicht -inf
+        // Stelle sicher, dass db eine Zahl ist und nicht -inf (Stille kommt als null)
         db = parseFloat(db);
         if (isNaN(db) || db === Number.NEGATIVE_INFINITY) {
             return 0;
@@ -123,6 +235,7 @@ function updateMeters(leftDb, rightDb) {
     if (leftMeter && rightMeter) {
         // Aktualisierungsfunktion für einzelnen Meter
         const updateMeter = (meter, db) => {
+            if (db === null) db = Number.NEGATIVE_INFINITY;
             const height = dbToPercent(db);
             meter.style.height = `${height}%`;
             
@@ -312,8 +425,25 @@ function setupEventListeners() {
     });
 }
 
+// Meter nur anfordern, solange die Seite sichtbar ist
+document.addEventListener('visibilitychange', () => {
+    if (ws && ws.readyState === WebSocket.OPEN) {
+        ws.send(JSON.stringify({
+            type: 'meters_view',
+            active: !document.hidden
+        }));
+    }
+});
+
 // Initialisierung beim Laden der Seite
 document.addEventListener('DOMContentLoaded', () => {
     // Verbinde WebSocket
     connectWebSocket();
+
+    // Oberfläche für das nächste Öffnen im Cache halten (siehe sw.js)
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.error('Service Worker konnte nicht registriert werden:', error);
+        });
+    }
 });
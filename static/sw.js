@@ -0,0 +1,52 @@
+// Service Worker: hält die Oberfläche im Cache, damit sie auch über schlechtes WLAN sofort öffnet.
+// Die Adressen bekommen beim Ausliefern den Hash ihres Inhalts (?v=...), siehe static_assets.py;
+// jede Änderung an einer Datei ergibt damit einen neuen Service Worker mit eigenem Cache.
+const SHELL = [
+    '/static/index.html',
+    '/static/styles.css',
+    '/static/script.js',
+    '/static/manifest.json',
+    '/static/icons/icon-192.svg',
+    '/static/icons/icon-512.svg'
+];
+
+// index.html verweist auf alle anderen Dateien, ihr Hash ist damit die Version der Oberfläche
+const CACHE_PREFIX = 'x32-shell-';
+const CACHE = CACHE_PREFIX + (new URL(SHELL[0], self.location.origin).searchParams.get('v') || 'dev');
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE)
+            .then(cache => cache.addAll(SHELL))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Caches älterer Versionen entfernen
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith(CACHE_PREFIX) && key !== CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    // Startseite aus dem Cache; WebSocket und API gehen weiter direkt an den Server
+    if (request.mode === 'navigate' && url.pathname === '/') {
+        event.respondWith(
+            caches.match(SHELL[0]).then(cached => cached || fetch(request))
+        );
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(
+            caches.match(request).then(cached => cached || fetch(request))
+        );
+    }
+});
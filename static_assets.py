@@ -0,0 +1,134 @@
+"""
+X32 Simple Controller - Vorkomprimierte statische Dateien mit Cache-Validierung
+Autor: Christopher Gertig
+
+Beim Start wird jede Datei in static/ einmal gelesen, gehasht und als gzip und
+Brotli (falls das Paket brotli installiert ist) komprimiert. Verweise auf
+/static/... in Textdateien bekommen den Hash der Zieldatei als ?v=<hash>; solche
+Adressen gelten ein Jahr als unveränderlich. Alles andere wird per ETag revalidiert.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Kleine Dateien werden nicht komprimiert, der Aufwand lohnt nicht
+COMPRESS_MIN_SIZE = 256
+TEXT_TYPES = ("text/", "application/javascript", "application/json", "application/manifest+json", "image/svg+xml")
+# Verweise in Textdateien, die einen Hash bekommen
+REFERENCE = re.compile(rb"/static/[\w./-]+")
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+
+def _media_type(name):
+    if name == "manifest.json":
+        return "application/manifest+json"
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+# Eine Datei mit ihren Kodierungen: {"br": ..., "gzip": ..., "identity": ...}
+class Asset:
+    __slots__ = ("media_type", "hash", "bodies")
+
+    def __init__(self, media_type, content):
+        self.media_type = media_type
+        self.hash = hashlib.sha256(content).hexdigest()[:16]
+        self.bodies = {"identity": content}
+        if len(content) >= COMPRESS_MIN_SIZE and media_type.startswith(TEXT_TYPES):
+            # mtime=0, damit gleiche Inhalte in jedem Prozess gleich komprimiert sind
+            compressed = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed["br"] = brotli.compress(content, quality=11)
+            for encoding, body in compressed.items():
+                if len(body) < len(content):
+                    self.bodies[encoding] = body
+
+    def etag(self, encoding):
+        return f'"{self.hash}"' if encoding == "identity" else f'"{self.hash}-{encoding}"'
+
+
+def build_assets(directory, url_prefix="/static"):
+    """Read, version and compress every file below directory; returns {URL: Asset}"""
+    contents = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            url = url_prefix + "/" + os.path.relpath(path, directory).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                contents[url] = f.read()
+
+    assets = {}
+
+    def resolve(url, visiting=()):
+        # Verweise zuerst auflösen: der Hash einer Datei hängt von den Hashes ihrer Ziele ab
+        if url in assets:
+            return assets[url]
+        content = contents[url]
+        media_type = _media_type(url.rsplit("/", 1)[1])
+        if media_type.startswith(TEXT_TYPES):
+            def versioned(match):
+                target = match.group(0).decode()
+                if target not in contents or target in visiting or target == url:
+                    return match.group(0)
+                return f"{target}?v={resolve(target, visiting + (url,)).hash}".encode()
+            content = REFERENCE.sub(versioned, content)
+        assets[url] = Asset(media_type, content)
+        return assets[url]
+
+    for url in contents:
+        resolve(url)
+    logger.info("Prepared %d static files (%s)", len(assets), "gzip, br" if brotli else "gzip")
+    return assets
+
+
+def choose_encoding(asset, accept_encoding):
+    """Best available encoding the client accepts: br, then gzip, then identity"""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding in asset.bodies and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+def asset_response(asset, request, immutable=False):
+    """Response for an asset, 304 when the client's ETag still matches"""
+    encoding = choose_encoding(asset, request.headers.get("accept-encoding", ""))
+    etag = asset.etag(encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=asset.bodies[encoding], media_type=asset.media_type, headers=headers)
@@ -0,0 +1,48 @@
+"""
+X32 Simple Controller - Abos auf das gesamte Mischpult per /formatsubscribe
+Autor: Christopher Gertig
+
+Der X32 schickt für jedes Abo in festen Abständen alle Werte als einen Blob
+(4 Byte pro Adresse, little-endian, int oder float). Ein Block vergleicht den
+Blob als Ganzes mit dem vorherigen; nur geänderte Werte werden einzeln verarbeitet.
+"""
+
+import numpy as np
+
+
+# Ein /formatsubscribe-Abo: Alias, Adressen und zuletzt empfangener Blob
+class SubscriptionBlock:
+    def __init__(self, alias, paths, types):
+        self.alias = alias
+        self.address = "/" + alias  # Antworten kommen unter /<Alias>
+        self.paths = list(paths)
+        self._is_float = [osc_type == "f" for osc_type in types]
+        self._last = None
+
+    def reset(self):
+        """Forget the last reply; the next one reports every value (new connection)"""
+        self._last = None
+
+    def changes(self, blob):
+        """(index, path, value) for every value that differs from the previous reply"""
+        raw = np.frombuffer(blob, dtype="<u4")
+        # Manche Firmware-Stände stellen die Anzahl der Werte voran
+        if len(raw) == len(self.paths) + 1:
+            raw = raw[1:]
+        if len(raw) != len(self.paths):
+            raise ValueError(f"{self.address}: expected {len(self.paths)} values, got {len(raw)}")
+        if self._last is None:
+            changed = range(len(raw))
+        else:
+            changed = np.flatnonzero(raw != self._last).tolist()
+        self._last = raw.copy()
+        floats = raw.view("<f4")
+        ints = raw.view("<i4")
+        return [(index, self.paths[index],
+                 float(floats[index]) if self._is_float[index] else int(ints[index]))
+                for index in changed]
+
+    def forget(self, index):
+        """Report this value again with the next reply, even if it has not changed"""
+        if self._last is not None:
+            self._last[index] = ~self._last[index]
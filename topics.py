@@ -0,0 +1,149 @@
+"""
+X32 Simple Controller - Themen-Abos einzelner WebSocket-Clients
+Autor: Christopher Gertig
+
+Ein Client kann per {"type": "subscribe", "topics": {...}} festlegen, welche Updates
+er bekommt und wie oft, z.B. nur Mutes oder nur einen Kanal mit 5 Updates pro Sekunde:
+    {"mutes": {}, "faders": {"channels": ["HDMI"], "rate": 5}, "meters": {"rate": 2}}
+Ohne Abo bekommt ein Client alles. Verbindungsstatus wird immer gesendet.
+Zurückgehaltene Nachrichten behalten ihre Version; sie ist nur pro Kanal aufsteigend,
+nicht über alle Nachrichten an einen Client (siehe README).
+"""
+
+import asyncio
+import time
+
+from conflation import encode_updates
+
+# Thema -> Nachrichtentyp bzw. Schlüssel im Snapshot
+TOPICS = {"faders": "fader", "mutes": "mute", "names": "name", "meters": "meters"}
+KIND_TOPICS = {"fader": "faders", "mute": "mutes", "name": "names"}
+
+
+def parse_topics(spec):
+    """Validate a topics object from a client; returns {topic: (channels or None, interval or None)}"""
+    if not isinstance(spec, dict):
+        raise ValueError("topics must be an object")
+    unknown = set(spec) - set(TOPICS)
+    if unknown:
+        raise ValueError(f"Unknown topics: {', '.join(sorted(unknown))} (available: {', '.join(TOPICS)})")
+    topics = {}
+    for topic, options in spec.items():
+        if options is True or options is None:
+            options = {}
+        if not isinstance(options, dict):
+            raise ValueError(f"Options for {topic} must be an object")
+        channels = options.get("channels")
+        if channels is not None:
+            if topic == "meters":
+                raise ValueError("meters cannot be limited to channels")
+            if not isinstance(channels, list) or not all(isinstance(channel, str) for channel in channels):
+                raise ValueError(f"channels for {topic} must be a list of channel names")
+            channels = frozenset(channels)
+        rate = options.get("rate")
+        if rate is not None and (isinstance(rate, bool) or not isinstance(rate, (int, float)) or rate <= 0):
+            raise ValueError(f"rate for {topic} must be a positive number of updates per second")
+        topics[topic] = (channels, 1.0 / rate if rate else None)
+    return topics
+
+
+class _Topic:
+    __slots__ = ("channels", "interval", "next_due", "pending", "timer")
+
+    def __init__(self, channels, interval):
+        self.channels = channels
+        self.interval = interval
+        self.next_due = 0.0
+        self.pending = {}  # Kanal -> neueste zurückgehaltene Nachricht
+        self.timer = None
+
+
+# Filter und Ratenbegrenzung für einen Client; send(frame, key, origin) ist ClientConnection.send
+class TopicFilter:
+    def __init__(self, spec, send):
+        self._topics = {topic: _Topic(channels, interval)
+                        for topic, (channels, interval) in parse_topics(spec).items()}
+        self._send = send
+        self._meters_due = {}  # Meter-Bank -> frühester nächster Versand
+
+    def __contains__(self, topic):
+        return topic in self._topics
+
+    def offer(self, messages, origin=None):
+        """Send the messages this client subscribed to; rate-limited ones are held back
+        and only their newest value per channel is sent once the topic is due again.
+        """
+        now = time.monotonic()
+        due = []
+        opened = set()
+        for message in messages:
+            name = KIND_TOPICS.get(message["type"])
+            if name is None:
+                due.append(message)  # z.B. Verbindungsstatus
+                continue
+            topic = self._topics.get(name)
+            if topic is None or (topic.channels is not None and message["channel"] not in topic.channels):
+                continue
+            if topic.interval is None:
+                due.append(message)
+            elif name in opened or (topic.timer is None and now >= topic.next_due):
+                opened.add(name)
+                topic.pending[message["channel"]] = message
+            else:
+                topic.pending[message["channel"]] = message
+                self._schedule(name, topic, now)
+        for name in opened:
+            topic = self._topics[name]
+            due.extend(topic.pending.values())
+            topic.pending.clear()
+            topic.next_due = now + topic.interval
+        if due:
+            self._send(encode_updates(due), None, origin)
+
+    def _schedule(self, name, topic, now):
+        if topic.timer is None:
+            topic.timer = asyncio.get_running_loop().call_later(
+                max(0.0, topic.next_due - now), self._flush_topic, name)
+
+    def _flush_topic(self, name):
+        topic = self._topics[name]
+        topic.timer = None
+        if not topic.pending:
+            return
+        messages = list(topic.pending.values())
+        topic.pending.clear()
+        topic.next_due = time.monotonic() + topic.interval
+        self._send(encode_updates(messages), None, None)
+
+    def allow_meters(self, bank):
+        """True if a meter frame of this bank may be sent now (frames in between are dropped)"""
+        topic = self._topics.get("meters")
+        if topic is None:
+            return False
+        if topic.interval is None:
+            return True
+        now = time.monotonic()
+        if now < self._meters_due.get(bank, 0.0):
+            return False
+        self._meters_due[bank] = now + topic.interval
+        return True
+
+    def filter_snapshot(self, snapshot):
+        """Snapshot reduced to the subscribed topics and channels"""
+        snapshot = dict(snapshot)
+        for name in ("faders", "mutes", "names"):
+            topic = self._topics.get(name)
+            if topic is None:
+                snapshot[name] = {}
+            elif topic.channels is not None:
+                snapshot[name] = {channel: value for channel, value in snapshot[name].items()
+                                  if channel in topic.channels}
+        if "meters" not in self._topics:
+            snapshot["meters"] = {"left": None, "right": None}
+        return snapshot
+
+    def close(self):
+        for topic in self._topics.values():
+            if topic.timer is not None:
+                topic.timer.cancel()
+                topic.timer = None
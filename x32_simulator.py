@@ -0,0 +1,214 @@
+"""
+X32 Simple Controller - Simulierter X32 für Tests ohne Mischpult
+Autor: Christopher Gertig
+
+Start: python x32_simulator.py [--port 10023] [--meter-rate 20] [--fader-rate 5]
+Danach in config.py X32_IP = "127.0.0.1" setzen.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import struct
+import time
+
+from pythonosc import osc_packet
+
+from osc_transport import build_message
+from routing import CHANNEL_COUNT, build_console_paths
+from meters import METER_BANK_SIZES
+
+logger = logging.getLogger(__name__)
+
+# Der X32 beendet /xremote, Abos und Meter-Streams nach 10 Sekunden
+SUBSCRIPTION_TIMEOUT = 10.0
+
+
+def default_parameters():
+    """Initial console state for every mirrored parameter"""
+    params = {}
+    for path, osc_type in build_console_paths().items():
+        if osc_type == "s":
+            params[path] = ""
+        elif osc_type == "f":
+            params[path] = 0.0 if path.endswith("/level") else 0.75
+        else:
+            params[path] = 1 if path.endswith("/on") else 0
+    params["/main/st/config/name"] = "Main"
+    for num in range(1, CHANNEL_COUNT + 1):
+        params[f"/ch/{num:02d}/config/name"] = f"Ch {num:02d}"
+    return params
+
+
+def meter_blob(count, phase, fixed=None):
+    """Synthetic meter bank: every meter follows its own slow sine
+    fixed: {index: linear level} for meters with a set level
+    """
+    levels = [0.5 + 0.45 * math.sin(phase + i * 0.7) for i in range(count)]
+    for index, level in (fixed or {}).items():
+        if index < count:
+            levels[index] = level
+    return struct.pack(f"<i{count}f", count, *levels)
+
+
+# Fake-X32: beantwortet Abfragen, merkt sich Werte und sendet Meter und Änderungen
+class X32Simulator(asyncio.DatagramProtocol):
+    def __init__(self, meter_rate=20.0, fader_rate=0.0, fader_channels=None,
+                 name="x32-sim", model="X32", firmware="4.06"):
+        self.params = default_parameters()
+        self.meter_rate = meter_rate
+        self.fader_rate = fader_rate
+        self.fader_channels = list(fader_channels or range(1, CHANNEL_COUNT + 1))
+        self.on_fader_sent = None  # Callback(path, value, zeit) für Benchmarks
+        self.on_value_received = None  # Callback(path, value, zeit) für gesetzte Werte (Latenzmessung)
+        self.levels = {}           # Meter-Bank -> {Index: fester linearer Pegel}
+        self.packets_in = 0
+        self.packets_out = 0
+        self._info = (name, model, firmware)
+        self._transport = None
+        self._xremote = {}        # Client-Adresse -> Ablaufzeit
+        self._meters = {}         # (Client-Adresse, Bank) -> Ablaufzeit
+        self._subscriptions = {}  # (Client-Adresse, Alias) -> [Pfade, Intervall, Ablaufzeit, nächster Versand]
+        self._tasks = []
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._tasks = [asyncio.ensure_future(self._meter_loop())]
+        if self.fader_rate > 0:
+            self._tasks.append(asyncio.ensure_future(self._fader_loop()))
+
+    def connection_lost(self, exc):
+        for task in self._tasks:
+            task.cancel()
+
+    def _send(self, address, value, addr):
+        self._transport.sendto(build_message(address, value), addr)
+        self.packets_out += 1
+
+    def datagram_received(self, data, addr):
+        try:
+            packet = osc_packet.OscPacket(data)
+        except osc_packet.ParseError:
+            return
+        for timed_msg in packet.messages:
+            self.packets_in += 1
+            self._handle(timed_msg.message.address, list(timed_msg.message.params), addr)
+
+    def _handle(self, address, args, addr):
+        now = time.monotonic()
+        if address == "/xinfo":
+            name, model, firmware = self._info
+            self._send("/xinfo", ["127.0.0.1", name, model, firmware], addr)
+        elif address == "/xremote":
+            self._xremote[addr] = now + SUBSCRIPTION_TIMEOUT
+        elif address == "/meters" and args:
+            self._meters[(addr, args[0])] = now + SUBSCRIPTION_TIMEOUT
+        elif address == "/formatsubscribe" and len(args) >= 4:
+            alias, paths, time_factor = args[0], args[1:-3], args[-1]
+            interval = max(1, time_factor) * 0.05
+            self._subscriptions[(addr, alias)] = [paths, interval, now + SUBSCRIPTION_TIMEOUT, now]
+        elif address == "/renew" and args:
+            subscription = self._subscriptions.get((addr, args[0]))
+            if subscription:
+                subscription[2] = now + SUBSCRIPTION_TIMEOUT
+        elif address in self.params:
+            if not args:
+                # Abfrage: aktuellen Wert zurücksenden
+                self._send(address, self.params[address], addr)
+            else:
+                # Änderung: speichern und an alle anderen /xremote-Clients melden
+                self.params[address] = args[0]
+                if self.on_value_received:
+                    self.on_value_received(address, args[0], time.perf_counter())
+                self._notify(address, args[0], exclude=addr)
+
+    def _notify(self, address, value, exclude=None):
+        now = time.monotonic()
+        for client, expires in list(self._xremote.items()):
+            if expires < now:
+                del self._xremote[client]
+            elif client != exclude:
+                self._send(address, value, client)
+
+    def set_level(self, bank, index, level):
+        """Hold one meter at a fixed linear level (None = back to the sine)"""
+        if level is None:
+            self.levels.get(bank, {}).pop(index, None)
+        else:
+            self.levels.setdefault(bank, {})[index] = level
+
+    def move_fader(self, channel_num, value):
+        """Simulate someone moving a fader on the console surface"""
+        path = f"/ch/{channel_num:02d}/mix/fader"
+        # Wert auf float32 runden, damit er exakt so ankommt, wie er gesendet wurde
+        value = struct.unpack("<f", struct.pack("<f", value))[0]
+        self.params[path] = value
+        self._notify(path, value)
+        if self.on_fader_sent:
+            self.on_fader_sent(path, value, time.perf_counter())
+
+    async def _meter_loop(self):
+        interval = 1.0 / self.meter_rate
+        phase = 0.0
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            phase += interval * 2 * math.pi * 0.5
+            for (client, bank), expires in list(self._meters.items()):
+                if expires < now:
+                    del self._meters[(client, bank)]
+                    continue
+                count = METER_BANK_SIZES.get(bank, 32)
+                self._send(bank, meter_blob(count, phase, self.levels.get(bank)), client)
+            self._send_subscriptions(now)
+
+    def _send_subscriptions(self, now):
+        for (client, alias), subscription in list(self._subscriptions.items()):
+            paths, interval, expires, next_send = subscription
+            if expires < now:
+                del self._subscriptions[(client, alias)]
+            elif now >= next_send:
+                subscription[3] = now + interval
+                values = [self.params.get(path, 0.0) for path in paths]
+                blob = b"".join(struct.pack("<i", v) if isinstance(v, int) else struct.pack("<f", v)
+                                for v in values if not isinstance(v, str))
+                self._send(f"/{alias}", [blob], client)
+
+    async def _fader_loop(self):
+        interval = 1.0 / self.fader_rate
+        while True:
+            await asyncio.sleep(interval)
+            self.move_fader(random.choice(self.fader_channels), random.random())
+
+
+async def start_simulator(host="127.0.0.1", port=10023, **kwargs):
+    """Start a simulator on the running loop; returns (transport, simulator)"""
+    loop = asyncio.get_running_loop()
+    return await loop.create_datagram_endpoint(
+        lambda: X32Simulator(**kwargs), local_addr=(host, port)
+    )
+
+
+async def _main(args):
+    transport, simulator = await start_simulator(
+        args.host, args.port, meter_rate=args.meter_rate, fader_rate=args.fader_rate
+    )
+    print(f"X32-Simulator läuft auf {args.host}:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        transport.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulierter Behringer X32 (OSC über UDP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10023)
+    parser.add_argument("--meter-rate", type=float, default=20.0, help="Meter-Frames pro Sekunde")
+    parser.add_argument("--fader-rate", type=float, default=0.0, help="Zufällige Faderbewegungen pro Sekunde")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass